@@ -332,7 +332,7 @@ class IndexCodebaseResponse(TypedDict):
     performance: IndexingPerformance
     code: CodeIndexingStats
     documentation: DocIndexingStats
-    details: IndexingDetails
+    details: NotRequired[IndexingDetails]
 
 
 # ---------------------------------------------------------------------------
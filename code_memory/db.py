@@ -15,11 +15,14 @@ import logging
 import os
 import sqlite3
 import sys
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime
 from functools import lru_cache
 from typing import TYPE_CHECKING
 
+import numpy as np
 import sqlite_vec
 import xxhash
 
@@ -55,6 +58,12 @@ CODE_MEMORY_RERANK = os.environ.get("CODE_MEMORY_RERANK", "false").lower() in ("
 DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-TinyBERT-L-2-v2"
 RERANK_MODEL_NAME = os.environ.get("RERANK_MODEL", DEFAULT_RERANK_MODEL)
 
+# Storage dtype for embedding vectors.  Embeddings are L2-normalised, so every
+# component lies in [-1, 1] and a fixed scale of 127 quantises to int8 with
+# negligible ranking loss while quartering blob size and scan bandwidth.
+# Recorded in index_metadata so a dtype change invalidates old indexes.
+EMBEDDING_DTYPE = "int8"
+
 # Check for bundled model (used in PyInstaller builds)
 _BUNDLED_MODEL_PATH = None
 if getattr(sys, 'frozen', False):
@@ -395,6 +404,14 @@ CREATE TABLE IF NOT EXISTS symbols (
     UNIQUE(file_id, name, kind, line_start)
 );
 
+-- Exact-name lookups (find_definition fast path)
+CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);
+
+-- Span lookups: containing-symbol resolution in find_references and the
+-- docstring lookup in find_definition filter by file then line range
+CREATE INDEX IF NOT EXISTS idx_symbols_file_span
+    ON symbols(file_id, line_start, line_end);
+
 -- 3. FTS5 content-sync'd to symbols (indexes name + source_text)
 CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5(
     name,
@@ -403,24 +420,6 @@ CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5(
     content_rowid=id
 );
 
--- Triggers to keep FTS5 in sync with symbols table
-CREATE TRIGGER IF NOT EXISTS symbols_ai AFTER INSERT ON symbols BEGIN
-    INSERT INTO symbols_fts(rowid, name, source_text)
-    VALUES (new.id, new.name, new.source_text);
-END;
-
-CREATE TRIGGER IF NOT EXISTS symbols_ad AFTER DELETE ON symbols BEGIN
-    INSERT INTO symbols_fts(symbols_fts, rowid, name, source_text)
-    VALUES ('delete', old.id, old.name, old.source_text);
-END;
-
-CREATE TRIGGER IF NOT EXISTS symbols_au AFTER UPDATE ON symbols BEGIN
-    INSERT INTO symbols_fts(symbols_fts, rowid, name, source_text)
-    VALUES ('delete', old.id, old.name, old.source_text);
-    INSERT INTO symbols_fts(rowid, name, source_text)
-    VALUES (new.id, new.name, new.source_text);
-END;
-
 -- 5. Cross-reference tracking
 CREATE TABLE IF NOT EXISTS references_ (
     id          INTEGER PRIMARY KEY,
@@ -455,6 +454,10 @@ CREATE TABLE IF NOT EXISTS doc_chunks (
     UNIQUE(doc_file_id, chunk_index)
 );
 
+-- Span lookups (docstring enrichment in find_definition)
+CREATE INDEX IF NOT EXISTS idx_doc_chunks_file_span
+    ON doc_chunks(doc_file_id, line_start, line_end);
+
 -- 8. FTS5 for documentation chunks (BM25 keyword search)
 CREATE VIRTUAL TABLE IF NOT EXISTS doc_chunks_fts USING fts5(
     content,
@@ -463,6 +466,29 @@ CREATE VIRTUAL TABLE IF NOT EXISTS doc_chunks_fts USING fts5(
     content_rowid=id
 );
 
+"""
+
+# FTS sync triggers, kept separate from the schema body so bulk_mode() can
+# drop them for a bulk load and re-create them afterwards.
+_FTS_TRIGGER_SQL = """
+-- Triggers to keep FTS5 in sync with symbols table
+CREATE TRIGGER IF NOT EXISTS symbols_ai AFTER INSERT ON symbols BEGIN
+    INSERT INTO symbols_fts(rowid, name, source_text)
+    VALUES (new.id, new.name, new.source_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS symbols_ad AFTER DELETE ON symbols BEGIN
+    INSERT INTO symbols_fts(symbols_fts, rowid, name, source_text)
+    VALUES ('delete', old.id, old.name, old.source_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS symbols_au AFTER UPDATE ON symbols BEGIN
+    INSERT INTO symbols_fts(symbols_fts, rowid, name, source_text)
+    VALUES ('delete', old.id, old.name, old.source_text);
+    INSERT INTO symbols_fts(rowid, name, source_text)
+    VALUES (new.id, new.name, new.source_text);
+END;
+
 -- Triggers to keep doc FTS5 in sync
 CREATE TRIGGER IF NOT EXISTS doc_chunks_ai AFTER INSERT ON doc_chunks BEGIN
     INSERT INTO doc_chunks_fts(rowid, content, section_title)
@@ -482,12 +508,74 @@ CREATE TRIGGER IF NOT EXISTS doc_chunks_au AFTER UPDATE ON doc_chunks BEGIN
 END;
 """
 
+_SCHEMA_SQL += _FTS_TRIGGER_SQL
+
+_FTS_TRIGGER_NAMES = (
+    "symbols_ai", "symbols_ad", "symbols_au",
+    "doc_chunks_ai", "doc_chunks_ad", "doc_chunks_au",
+)
+
+
+@contextmanager
+def bulk_mode(db: sqlite3.Connection):
+    """Suspend FTS sync triggers for a bulk load, then rebuild in one shot.
+
+    Per-insert trigger fan-out (an extra FTS write per symbol/chunk row) is
+    the main per-row overhead on an initial load.  Inside this context the
+    triggers are dropped so inserts hit only the base tables; on exit both
+    FTS tables are rebuilt from their content tables and the triggers are
+    re-created.  Only worthwhile when (re)building from empty — the
+    rebuild re-reads every row, so incremental runs should keep the
+    triggers live.
+
+    A ``bulk_in_progress`` marker in ``index_metadata`` is set on entry
+    and cleared after the rebuild commits.  If the process dies inside
+    the context, rows committed without trigger fan-out are missing from
+    FTS; the next :func:`get_db` run re-creates the triggers, and
+    :func:`fts_rebuild_pending` reports the marker so the next index run
+    re-enters bulk mode and rebuilds both tables.
+    """
+    db.execute(
+        "INSERT OR REPLACE INTO index_metadata (key, value) "
+        "VALUES ('bulk_in_progress', '1')"
+    )
+    db.commit()
+    for name in _FTS_TRIGGER_NAMES:
+        db.execute(f"DROP TRIGGER IF EXISTS {name}")
+    try:
+        yield db
+    finally:
+        db.execute("INSERT INTO symbols_fts(symbols_fts) VALUES('rebuild')")
+        db.execute("INSERT INTO doc_chunks_fts(doc_chunks_fts) VALUES('rebuild')")
+        db.executescript(_FTS_TRIGGER_SQL)
+        db.execute("DELETE FROM index_metadata WHERE key = 'bulk_in_progress'")
+        db.commit()
+
+
+def fts_rebuild_pending(db: sqlite3.Connection) -> bool:
+    """Return True if a previous bulk load died before rebuilding FTS."""
+    return db.execute(
+        "SELECT 1 FROM index_metadata WHERE key = 'bulk_in_progress'"
+    ).fetchone() is not None
+
+
+# One connection per database path, held for the life of the process.  Every
+# tool invocation calls get_db(), and re-opening paid connection setup,
+# pragma application and the schema/metadata bootstrap each time (the old
+# connections were also never closed).  SQLite in serialized threading mode
+# (sqlite3.threadsafety == 3, the CPython default build) makes a shared
+# connection safe to call from the MCP server's worker threads; on an
+# interpreter without it, get_db falls back to a connection per call.
+_DB_CONNS: dict[str, sqlite3.Connection] = {}
+_db_conns_lock = threading.Lock()
+
 
 def get_db(project_dir: str) -> sqlite3.Connection:
     """Open (or create) the database, load sqlite-vec, and ensure schema.
 
     The database is stored as {project_dir}/code_memory.db to ensure each
-    project has its own isolated index.
+    project has its own isolated index.  Connections are cached per path,
+    so repeat calls skip the open/pragma/schema bootstrap entirely.
 
     If the embedding model has changed since the last index, all indexed data
     is automatically invalidated and the index will need to be rebuilt.
@@ -498,9 +586,24 @@ def get_db(project_dir: str) -> sqlite3.Connection:
     Returns:
         A ready-to-use ``sqlite3.Connection`` with WAL mode and foreign keys.
     """
-    import os
     db_path = os.path.join(os.path.abspath(project_dir), "code_memory.db")
-    db = sqlite3.connect(db_path, check_same_thread=False)
+
+    if sqlite3.threadsafety < 3:
+        return _open_db(db_path)
+
+    with _db_conns_lock:
+        db = _DB_CONNS.get(db_path)
+        if db is None:
+            db = _DB_CONNS[db_path] = _open_db(db_path)
+    return db
+
+
+def _open_db(db_path: str) -> sqlite3.Connection:
+    """Open and bootstrap one connection (pragmas, schema, model metadata)."""
+    # cached_statements: sqlite3 keeps compiled statements per connection;
+    # the query layer issues enough distinct SQL (search, enrichment, dead
+    # code, stats) that the default 128 slots can thrash under mixed load.
+    db = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
     db.enable_load_extension(True)
     sqlite_vec.load(db)
     db.enable_load_extension(False)
@@ -521,9 +624,13 @@ def get_db(project_dir: str) -> sqlite3.Connection:
     stored_dim = db.execute(
         "SELECT value FROM index_metadata WHERE key = 'embedding_dim'"
     ).fetchone()
+    stored_dtype = db.execute(
+        "SELECT value FROM index_metadata WHERE key = 'embedding_dtype'"
+    ).fetchone()
 
     # Only load the model if we don't have matching stored metadata yet
-    if stored_model and stored_model[0] == EMBEDDING_MODEL_NAME and stored_dim:
+    if (stored_model and stored_model[0] == EMBEDDING_MODEL_NAME and stored_dim
+            and stored_dtype and stored_dtype[0] == EMBEDDING_DTYPE):
         embedding_dim = int(stored_dim[0])
         model_changed = False
     else:
@@ -533,10 +640,10 @@ def get_db(project_dir: str) -> sqlite3.Connection:
 
     if model_changed:
         if stored_model is not None:
-            # Model changed - invalidate existing index
+            # Model or storage dtype changed - invalidate existing index
             logger.info(
-                f"Embedding model changed from '{stored_model[0] if stored_model else 'none'}' "
-                f"to '{EMBEDDING_MODEL_NAME}'. Invalidating index..."
+                f"Embedding model or dtype changed from '{stored_model[0] if stored_model else 'none'}' "
+                f"to '{EMBEDDING_MODEL_NAME}' ({EMBEDDING_DTYPE}). Invalidating index..."
             )
             _invalidate_index(db, embedding_dim)
         else:
@@ -552,11 +659,101 @@ def get_db(project_dir: str) -> sqlite3.Connection:
             "INSERT OR REPLACE INTO index_metadata (key, value) VALUES ('embedding_dim', ?)",
             (str(embedding_dim),)
         )
+        db.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) VALUES ('embedding_dtype', ?)",
+            (EMBEDDING_DTYPE,)
+        )
         db.commit()
 
     return db
 
 
+# Hot status SQL kept as module constants: sqlite3's per-connection
+# statement cache keys on the SQL text, so a stable string object means the
+# compiled VDBE program is reused instead of re-prepared per call.
+_INDEX_COUNTS_SQL = """
+    SELECT (SELECT COUNT(*) FROM symbols),
+           (SELECT COUNT(*) FROM doc_chunks),
+           (SELECT COUNT(*) FROM files),
+           (SELECT COUNT(*) FROM doc_files)
+"""
+
+# table → "any rows at all?" probe.  LIMIT 1 rather than COUNT(*): the
+# callers only need emptiness, and COUNT walks the whole table.
+_TABLE_PROBE_SQL = {
+    "symbols": "SELECT 1 FROM symbols LIMIT 1",
+    "doc_chunks": "SELECT 1 FROM doc_chunks LIMIT 1",
+}
+
+
+# index_counts results cached per database path.  COUNT(*) walks each whole
+# table, and between index runs the counts cannot change from this process —
+# index_codebase calls invalidate_counts() when it finishes.  The short TTL
+# is a backstop against writers in other processes; in-memory databases
+# (empty path) bypass the cache entirely.
+_INDEX_COUNTS_TTL = 5.0
+_index_counts_cache: dict[str, tuple[float, tuple[int, int, int, int]]] = {}
+_index_counts_lock = threading.Lock()
+
+
+def index_counts(db: sqlite3.Connection) -> tuple[int, int, int, int]:
+    """Return (symbols, doc_chunks, files, doc_files) row counts in one query.
+
+    Values are memoized briefly (see :data:`_INDEX_COUNTS_TTL`) so polling
+    check_index_status stops re-scanning all four tables per call.
+    """
+    path = db.execute("PRAGMA database_list").fetchone()[2]
+    if not path:
+        return db.execute(_INDEX_COUNTS_SQL).fetchone()
+
+    now = time.monotonic()
+    with _index_counts_lock:
+        entry = _index_counts_cache.get(path)
+        if entry is not None and now - entry[0] < _INDEX_COUNTS_TTL:
+            return entry[1]
+
+    counts = db.execute(_INDEX_COUNTS_SQL).fetchone()
+    with _index_counts_lock:
+        _index_counts_cache[path] = (now, counts)
+    return counts
+
+
+def invalidate_counts() -> None:
+    """Drop memoized index_counts values after a write to the index."""
+    with _index_counts_lock:
+        _index_counts_cache.clear()
+
+
+def table_is_empty(db: sqlite3.Connection, table: str) -> bool:
+    """Return True if *table* (symbols or doc_chunks) has no rows."""
+    return db.execute(_TABLE_PROBE_SQL[table]).fetchone() is None
+
+
+def open_reader(db_path: str) -> sqlite3.Connection:
+    """Open a lightweight read-only connection to an existing database.
+
+    Used by the query layer to run independent search legs on their own
+    connections (a single ``sqlite3.Connection`` cannot execute two
+    statements concurrently).  Skips the schema/metadata bootstrapping of
+    :func:`get_db` — the database must already exist — and marks the
+    connection ``query_only`` so it can never interfere with writers.
+
+    The BM25 and vector search legs run here, so these connections carry
+    the same cache/mmap tuning as the writer — with the ~2 MB default page
+    cache and no mmap the hottest scans in the system would be the least
+    tuned.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+    conn.enable_load_extension(False)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA cache_size=-64000")      # 64 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")      # Temp tables in RAM
+    conn.execute("PRAGMA mmap_size=268435456")    # 256 MB memory-mapped I/O
+    return conn
+
+
 def _invalidate_index(db: sqlite3.Connection, embedding_dim: int) -> None:
     """Invalidate the index by clearing all data and recreating embedding tables.
 
@@ -574,20 +771,31 @@ def _invalidate_index(db: sqlite3.Connection, embedding_dim: int) -> None:
     db.execute("DELETE FROM doc_chunks")
     db.execute("DELETE FROM doc_files")
 
+    # Recorded tree signatures describe rows that no longer exist; left in
+    # place they would make the next index run skip its re-scan and leave
+    # search empty until a file's mtime changed.
+    db.execute("DELETE FROM index_metadata WHERE key LIKE 'tree_signature:%'")
+
     # Recreate embedding tables with new dimension
     _create_embedding_tables(db, embedding_dim)
     logger.info("Index invalidated and embedding tables recreated")
 
 
 def _create_embedding_tables(db: sqlite3.Connection, embedding_dim: int) -> None:
-    """Create the embedding virtual tables with the specified dimension."""
+    """Create the embedding virtual tables with the specified dimension.
+
+    Vectors are stored as int8 (see :data:`EMBEDDING_DTYPE`): a 4x saving in
+    storage and KNN-scan bandwidth over float32, with integer distance
+    arithmetic that vectorises well. Both stored vectors and query vectors
+    must go through :func:`quantize_embedding`.
+    """
     # sqlite-vec virtual table for code embeddings
     db.execute(
         f"""
         CREATE VIRTUAL TABLE IF NOT EXISTS symbol_embeddings
         USING vec0(
             symbol_id INTEGER PRIMARY KEY,
-            embedding float[{embedding_dim}]
+            embedding int8[{embedding_dim}]
         )
         """
     )
@@ -598,7 +806,7 @@ def _create_embedding_tables(db: sqlite3.Connection, embedding_dim: int) -> None
         CREATE VIRTUAL TABLE IF NOT EXISTS doc_embeddings
         USING vec0(
             chunk_id INTEGER PRIMARY KEY,
-            embedding float[{embedding_dim}]
+            embedding int8[{embedding_dim}]
         )
         """
     )
@@ -629,6 +837,43 @@ def file_hash(filepath: str) -> str:
     return h.hexdigest()
 
 
+def hash_bytes(data: bytes) -> str:
+    """Compute the same xxh64 content hash as :func:`file_hash` from memory.
+
+    Used when the caller already holds the file contents (or a read-only
+    mmap of them), avoiding a second open-and-read of the file just to
+    hash it.
+
+    Args:
+        data: File contents as a bytes-like object.
+
+    Returns:
+        Hexadecimal string representation of the 64-bit hash.
+    """
+    return xxhash.xxh64(data).hexdigest()
+
+
+def quantize_embedding(embedding: list[float]) -> bytes:
+    """Quantize a normalised float embedding to an int8 blob.
+
+    Embeddings are L2-normalised so every component is in [-1, 1]; a fixed
+    scale of 127 maps them to int8 with no per-vector scale bookkeeping.
+    Query vectors must be quantized the same way so KNN distances stay
+    comparable with the stored vectors.
+
+    Args:
+        embedding: Normalised embedding vector.
+
+    Returns:
+        Packed int8 blob suitable for a vec0 ``int8[dim]`` column.
+    """
+    # One C-level pass instead of a per-component Python loop feeding
+    # struct.pack through the argument tuple.  np.rint matches round()'s
+    # half-to-even behaviour, so stored blobs are byte-identical.
+    arr = np.asarray(embedding, dtype=np.float64)
+    return np.clip(np.rint(arr * 127.0), -127, 127).astype(np.int8).tobytes()
+
+
 def upsert_file(
     db: sqlite3.Connection,
     path: str,
@@ -673,6 +918,29 @@ def delete_file_data(db: sqlite3.Connection, file_id: int, auto_commit: bool = T
         db.commit()
 
 
+def upsert_symbols_many(
+    db: sqlite3.Connection,
+    rows: list[tuple],
+) -> None:
+    """Insert multiple symbol rows in one executemany call.
+
+    Each row is (name, kind, file_id, line_start, line_end,
+    parent_symbol_id, source_text).  Uses INSERT OR IGNORE so rows that
+    collide on UNIQUE(file_id, name, kind, line_start) are silently
+    dropped rather than aborting the batch.  Caller must manage the
+    transaction.
+    """
+    if not rows:
+        return
+    db.executemany(
+        """INSERT OR IGNORE INTO symbols
+               (name, kind, file_id, line_start, line_end,
+                parent_symbol_id, source_text)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+
+
 def batch_insert_embeddings(
     db: sqlite3.Connection,
     pairs: list[tuple[int, list[float]]],
@@ -682,12 +950,9 @@ def batch_insert_embeddings(
     Assumes stale embeddings for these symbols have already been deleted
     (e.g. via delete_file_data).  Caller must manage the transaction.
     """
-    import struct
-
     if not pairs:
         return
-    dim = len(pairs[0][1])
-    rows = [(sid, struct.pack(f"{dim}f", *emb)) for sid, emb in pairs]
+    rows = [(sid, quantize_embedding(emb)) for sid, emb in pairs]
     db.executemany(
         "INSERT INTO symbol_embeddings (symbol_id, embedding) VALUES (?, ?)",
         rows,
@@ -703,12 +968,9 @@ def batch_insert_doc_embeddings(
     Assumes stale embeddings have already been deleted.
     Caller must manage the transaction.
     """
-    import struct
-
     if not pairs:
         return
-    dim = len(pairs[0][1])
-    rows = [(cid, struct.pack(f"{dim}f", *emb)) for cid, emb in pairs]
+    rows = [(cid, quantize_embedding(emb)) for cid, emb in pairs]
     db.executemany(
         "INSERT INTO doc_embeddings (chunk_id, embedding) VALUES (?, ?)",
         rows,
@@ -807,9 +1069,7 @@ def upsert_doc_embedding(
     auto_commit: bool = True,
 ) -> None:
     """Insert or replace a documentation chunk's dense vector embedding."""
-    import struct
-
-    blob = struct.pack(f"{len(embedding)}f", *embedding)
+    blob = quantize_embedding(embedding)
     db.execute("DELETE FROM doc_embeddings WHERE chunk_id = ?", (chunk_id,))
     db.execute(
         "INSERT INTO doc_embeddings (chunk_id, embedding) VALUES (?, ?)",
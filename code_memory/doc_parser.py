@@ -470,6 +470,7 @@ def extract_docstrings_from_code(db) -> list[dict]:
     if embed_inputs:
         embeddings = db_mod.embed_texts_batch(embed_inputs, task_type="code2code")
 
+        embedding_pairs: list[tuple[int, list[float]]] = []
         with db_mod.transaction(db):
             for i, doc_info in enumerate(docstrings_to_store):
                 file_path = doc_info["file_path"]
@@ -510,7 +511,10 @@ def extract_docstrings_from_code(db) -> list[dict]:
                     auto_commit=False,
                 )
 
-                db_mod.upsert_doc_embedding(db, chunk_id, embeddings[i], auto_commit=False)
+                # Chunks here are always freshly inserted (next free
+                # chunk_index), so there is no stale embedding to delete and
+                # the batch insert below is safe.
+                embedding_pairs.append((chunk_id, embeddings[i]))
 
                 results.append({
                     "symbol": doc_info["name"],
@@ -519,6 +523,8 @@ def extract_docstrings_from_code(db) -> list[dict]:
                     "docstring_length": len(doc_info["docstring"]),
                 })
 
+            db_mod.batch_insert_doc_embeddings(db, embedding_pairs)
+
     return results
 
 
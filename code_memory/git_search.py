@@ -15,6 +15,7 @@ Design rules
 
 from __future__ import annotations
 
+import functools
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
@@ -73,7 +74,18 @@ def get_repo(path: str = ".") -> git.Repo:
         NoSuchPathError: When *path* does not exist.
     """
     resolved = Path(path).resolve()
-    return git.Repo(str(resolved), search_parent_directories=True)
+    return _repo_for(str(resolved))
+
+
+@functools.lru_cache(maxsize=4)
+def _repo_for(resolved: str) -> git.Repo:
+    """Cache ``git.Repo`` construction per resolved path.
+
+    Building a Repo walks parent directories and reads git config on every
+    call; the object itself reads refs and objects lazily per operation, so
+    a cached instance always reflects the repository's current state.
+    """
+    return git.Repo(resolved, search_parent_directories=True)
 
 
 # ---------------------------------------------------------------------------
@@ -102,15 +102,46 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(f"code_memory.{name}")
 
 
+class _NullToolLogger:
+    """Shared no-op stand-in handed out when tool logging is suppressed.
+
+    Implements just the surface server code touches; exceptions still
+    propagate to the caller's error handling.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> _NullToolLogger:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False  # Don't suppress exceptions
+
+    def set_result_count(self, count: int) -> None:
+        pass
+
+
+_NULL_TOOL_LOGGER = _NullToolLogger()
+
+
 class ToolLogger:
     """Context manager for logging tool invocations with timing.
 
+    When INFO logging is disabled for the tools logger, construction
+    returns a shared no-op instance so hot tool paths skip the parameter
+    capture, timestamping and message formatting entirely.
+
     Usage:
         with ToolLogger("search_code", query="test", search_type="definition") as log:
             result = perform_search()
             log.set_result_count(len(result))
     """
 
+    def __new__(cls, tool_name: str, **params):
+        if not get_logger("tools").isEnabledFor(logging.INFO):
+            return _NULL_TOOL_LOGGER
+        return super().__new__(cls)
+
     def __init__(self, tool_name: str, **params):
         self.tool_name = tool_name
         self.params = params
@@ -9,21 +9,69 @@ that every source file is still searchable via BM25 / vector search.
 
 from __future__ import annotations
 
+import importlib
 import logging
+import mmap
 import os
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import pathspec
-from tree_sitter import Language, Node, Parser
+from tree_sitter import Language, Node, Parser, Query, QueryCursor, Tree
 
 from . import db as db_mod
+from . import queries
 
 logger = logging.getLogger(__name__)
 
-# Number of worker threads for parallel indexing (configurable via env)
-MAX_WORKERS = int(os.environ.get("CODE_MEMORY_MAX_WORKERS", "4"))
+# Number of worker threads for parallel indexing (configurable via env,
+# defaults to the machine's core count).  Threads rather than processes:
+# tree-sitter releases the GIL while parsing, parsed symbols carry large
+# source_text payloads that would have to be pickled across a process
+# boundary, and SQLite writes stay on the main thread either way.
+MAX_WORKERS = int(os.environ.get("CODE_MEMORY_MAX_WORKERS", "0")) or (os.cpu_count() or 4)
+
+# Files above this size are memory-mapped instead of read into a bytes copy;
+# below it the read syscall overhead is cheaper than setting up a mapping
+_MMAP_THRESHOLD = 256 * 1024
+
+
+def _count_newlines(buf, start: int = 0, end: int | None = None) -> int:
+    """Count newlines in *buf*, which may be ``bytes`` or an ``mmap``.
+
+    ``mmap`` objects expose ``find`` but not ``count``, so mapped buffers
+    are scanned with a find loop instead of copying them into bytes.
+    """
+    if isinstance(buf, bytes):
+        return buf.count(b"\n", start, end)
+    if end is None:
+        end = len(buf)
+    count = 0
+    pos = buf.find(b"\n", start, end)
+    while pos != -1:
+        count += 1
+        pos = buf.find(b"\n", pos + 1, end)
+    return count
+
+# Cap on stored per-symbol source text, in bytes (matches the whole-file
+# fallback snippet cap)
+_MAX_SYMBOL_SOURCE_BYTES = 5000
+
+# Files stored per transaction during bulk indexing.  Every commit is a WAL
+# sync point, so committing per file makes durability the dominant cost of a
+# cold index; a crash loses at most one batch, which the freshness check
+# re-indexes on the next run.
+_COMMIT_EVERY_FILES = 100
+
+# Reference extraction is skipped for files past either of these limits:
+# a multi-megabyte source or an average line length typical of minified
+# bundles would emit thousands of identifier rows nobody ever searches.
+_MAX_REF_FILE_BYTES = 1_000_000
+_MINIFIED_BYTES_PER_LINE = 500
 
 # ── Directories to always skip (even without .gitignore) ───────────────
 SKIP_DIRS = frozenset({
@@ -139,95 +187,296 @@ _SOURCE_EXTENSIONS = frozenset({
 # Tree-sitter language registry  (lazy-loaded)
 # ---------------------------------------------------------------------------
 
-_LANGUAGES: dict[str, Language] = {}
+# Cache of ext → Language.  None entries are cached too, so an unknown or
+# missing grammar costs one failed lookup ever instead of a retried import
+# for every file with that extension.
+_LANGUAGES: dict[str, Language | None] = {}
+
+# ext → (module name, language-factory attribute).  Imports happen lazily in
+# _try_import_language, so only grammars for extensions actually present in
+# the indexed tree get loaded (each grammar maps in a shared library and its
+# parse tables).  Adding a language is one dict entry.
+_GRAMMAR_IMPORTS: dict[str, tuple[str, str]] = {
+    ".py":   ("tree_sitter_python", "language"),
+    ".js":   ("tree_sitter_javascript", "language"),
+    ".jsx":  ("tree_sitter_javascript", "language"),
+    # TypeScript grammar exposes typescript and tsx separately
+    ".ts":   ("tree_sitter_typescript", "language_typescript"),
+    ".tsx":  ("tree_sitter_typescript", "language_tsx"),
+    ".java": ("tree_sitter_java", "language"),
+    ".go":   ("tree_sitter_go", "language"),
+    ".rs":   ("tree_sitter_rust", "language"),
+    ".c":    ("tree_sitter_c", "language"),
+    ".h":    ("tree_sitter_c", "language"),
+    ".cpp":  ("tree_sitter_cpp", "language"),
+    ".hpp":  ("tree_sitter_cpp", "language"),
+    ".cc":   ("tree_sitter_cpp", "language"),
+    ".cxx":  ("tree_sitter_cpp", "language"),
+    ".rb":   ("tree_sitter_ruby", "language"),
+    ".kt":   ("tree_sitter_kotlin", "language"),
+    ".kts":  ("tree_sitter_kotlin", "language"),
+}
 
 
 def _load_language(ext: str) -> Language | None:
     """Return a tree-sitter Language for the given file extension, or None."""
-    if ext in _LANGUAGES:
-        return _LANGUAGES[ext]
+    if ext not in _LANGUAGES:
+        _LANGUAGES[ext] = _try_import_language(ext)
+    return _LANGUAGES[ext]
+
+
+# Whether an extension is worth indexing at all, folded into one boolean so
+# the directory walker does a single dict hit per file instead of a frozenset
+# probe plus a language-cache probe.  After _warmup_languages this covers
+# every grammar-backed extension up front.
+_EXT_HAS_GRAMMAR: dict[str, bool] = {}
+
+
+def _ext_indexable(ext: str) -> bool:
+    """Return True if files with extension *ext* should be indexed."""
+    if ext in _SOURCE_EXTENSIONS:
+        return True
+    indexable = _EXT_HAS_GRAMMAR.get(ext)
+    if indexable is None:
+        indexable = _EXT_HAS_GRAMMAR[ext] = _load_language(ext) is not None
+    return indexable
+
+
+# Parser instances, cached per thread per extension.  Parsers are stateless
+# between parses and cheap to reuse, but one instance must never run two
+# parses at the same time — parsing happens inside the indexing thread pool,
+# so the cache is thread-local rather than module-global.
+_PARSER_CACHE = threading.local()
+
+
+def _get_parser(ext: str) -> Parser | None:
+    """Return a reusable Parser for *ext* (or None without a grammar)."""
+    cache: dict[str, Parser] | None = getattr(_PARSER_CACHE, "parsers", None)
+    if cache is None:
+        cache = _PARSER_CACHE.parsers = {}
+    parser = cache.get(ext)
+    if parser is None:
+        lang = _load_language(ext)
+        if lang is None:
+            return None
+        parser = cache[ext] = Parser(lang)
+    return parser
 
-    lang = _try_import_language(ext)
-    if lang is not None:
-        _LANGUAGES[ext] = lang
-    return lang
+
+# ---------------------------------------------------------------------------
+# Incremental parse cache
+# ---------------------------------------------------------------------------
+
+# abs path → (content_hash, source_bytes, Tree) from the last successful
+# parse.  When a file changes, the old tree plus a single tree.edit() lets
+# tree-sitter re-parse only the affected nodes instead of the whole file.
+# Trees wrap C allocations and cannot be pickled, so the cache lives in the
+# process rather than SQLite — in the long-lived MCP server it survives
+# across index_codebase calls, which is where repeated re-index runs happen.
+# Files read via mmap (above _MMAP_THRESHOLD) are never cached because
+# their buffers are closed right after parsing.
+_TREE_CACHE: dict[str, tuple[str, bytes, Tree]] = {}
+_TREE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_tree_cache_bytes = 0
+_tree_cache_lock = threading.Lock()
+
+
+def _point_at(buf, offset: int) -> tuple[int, int]:
+    """Return the tree-sitter (row, column) point for *offset* in *buf*.
+
+    *buf* may be ``bytes`` or an ``mmap`` (hence :func:`_count_newlines`
+    rather than ``count``, which mmap lacks).
+    """
+    row = _count_newlines(buf, 0, offset)
+    line_start = buf.rfind(b"\n", 0, offset) + 1
+    return row, offset - line_start
+
+
+def _edit_span(old: bytes, new) -> tuple[int, int, int]:
+    """Return ``(start, old_end, new_end)`` byte offsets of the changed span.
+
+    Collapses the difference between the two buffers into one replacement
+    edit by finding the longest common prefix and suffix — compared in 1 KiB
+    blocks first, then byte-wise at the boundary.
+    """
+    limit = min(len(old), len(new))
+    block = 1024
+    prefix = 0
+    while (prefix + block <= limit
+           and old[prefix:prefix + block] == new[prefix:prefix + block]):
+        prefix += block
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    max_suffix = limit - prefix
+    suffix = 0
+    while (suffix + block <= max_suffix
+           and old[len(old) - suffix - block:len(old) - suffix]
+           == new[len(new) - suffix - block:len(new) - suffix]):
+        suffix += block
+    while suffix < max_suffix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    return prefix, len(old) - suffix, len(new) - suffix
+
+
+def _parse_source(parser: Parser, filepath: str, source_bytes, fhash: str) -> Tree:
+    """Parse *source_bytes*, reusing the file's previous tree incrementally.
+
+    The cache entry is popped up front and only re-inserted after a
+    successful parse, so a parse failure never leaves a half-edited tree
+    behind (and concurrent workers never share a tree).
+    """
+    global _tree_cache_bytes
+    with _tree_cache_lock:
+        cached = _TREE_CACHE.pop(filepath, None)
+        if cached is not None:
+            _tree_cache_bytes -= len(cached[1])
+
+    old_tree: Tree | None = None
+    if cached is not None:
+        old_hash, old_src, old_tree = cached
+        if old_hash == fhash:
+            # Same content re-parsed (e.g. the DB row was gone but the
+            # process cache survived): the cached tree is already current.
+            with _tree_cache_lock:
+                _TREE_CACHE[filepath] = cached
+                _tree_cache_bytes += len(old_src)
+            return old_tree
+        start, old_end, new_end = _edit_span(old_src, source_bytes)
+        old_tree.edit(
+            start_byte=start,
+            old_end_byte=old_end,
+            new_end_byte=new_end,
+            start_point=_point_at(old_src, start),
+            old_end_point=_point_at(old_src, old_end),
+            new_end_point=_point_at(source_bytes, new_end),
+        )
+
+    if old_tree is not None:
+        tree = parser.parse(source_bytes, old_tree)
+    else:
+        tree = parser.parse(source_bytes)
+
+    # mmap-backed buffers are closed by the caller; only plain bytes may
+    # outlive the parse inside the cache.
+    if isinstance(source_bytes, bytes):
+        with _tree_cache_lock:
+            _TREE_CACHE[filepath] = (fhash, source_bytes, tree)
+            _tree_cache_bytes += len(source_bytes)
+            # FIFO eviction (insertion-ordered dict) keeps retained source
+            # under the byte budget
+            while _tree_cache_bytes > _TREE_CACHE_MAX_BYTES and len(_TREE_CACHE) > 1:
+                evicted = _TREE_CACHE.pop(next(iter(_TREE_CACHE)))
+                _tree_cache_bytes -= len(evicted[1])
+    return tree
 
 
 def _try_import_language(ext: str) -> Language | None:
     """Attempt to import the tree-sitter grammar for *ext*."""
+    spec = _GRAMMAR_IMPORTS.get(ext)
+    if spec is None:
+        return None
+    module_name, factory_attr = spec
     try:
-        if ext == ".py":
-            import tree_sitter_python as mod
-        elif ext in (".js", ".jsx"):
-            import tree_sitter_javascript as mod
-        elif ext in (".ts", ".tsx"):
-            import tree_sitter_typescript as ts_mod
-            # TypeScript grammar exposes typescript and tsx separately
-            if ext == ".tsx":
-                return Language(ts_mod.language_tsx())
-            return Language(ts_mod.language_typescript())
-        elif ext == ".java":
-            import tree_sitter_java as mod
-        elif ext == ".go":
-            import tree_sitter_go as mod
-        elif ext == ".rs":
-            import tree_sitter_rust as mod
-        elif ext in (".c", ".h"):
-            import tree_sitter_c as mod
-        elif ext in (".cpp", ".hpp", ".cc", ".cxx"):
-            import tree_sitter_cpp as mod
-        elif ext == ".rb":
-            import tree_sitter_ruby as mod
-        elif ext in (".kt", ".kts"):
-            import tree_sitter_kotlin as mod
-        else:
-            return None
-        return Language(mod.language())
+        mod = importlib.import_module(module_name)
     except ImportError:
         logger.debug("No tree-sitter grammar for %s", ext)
         return None
+    return Language(getattr(mod, factory_attr)())
+
+
+def _warmup_languages() -> None:
+    """Eagerly load every known grammar into the language cache.
+
+    Opt-in via CODE_MEMORY_PRELOAD_GRAMMARS: a long-lived server can pay
+    all grammar imports once at startup instead of on first use in the
+    middle of an indexing run.  Unknown extensions are negative-cached by
+    ``_load_language`` either way, so they never re-trigger imports.
+    """
+    for ext in _GRAMMAR_IMPORTS:
+        _EXT_HAS_GRAMMAR[ext] = _load_language(ext) is not None
+
+
+if os.environ.get("CODE_MEMORY_PRELOAD_GRAMMARS", "").lower() in ("true", "1", "yes"):
+    _warmup_languages()
 
 
 # ---------------------------------------------------------------------------
 # Tree-sitter node-type → symbol kind mapping (per language family)
 # ---------------------------------------------------------------------------
 
+# Normalised symbol kinds as small ints: the walker compares the parent
+# kind for every symbol node, and integer equality is a single COMPARE_OP
+# where string comparison goes through hashing.  _KIND_NAMES maps back to
+# the strings stored in the database.
+_KIND_NONE, _KIND_FUNCTION, _KIND_METHOD, _KIND_CLASS, _KIND_VARIABLE = range(5)
+_KIND_NAMES = {
+    _KIND_FUNCTION: "function",
+    _KIND_METHOD:   "method",
+    _KIND_CLASS:    "class",
+    _KIND_VARIABLE: "variable",
+}
+
 # Maps tree-sitter node types to our normalised (kind, is_container) pairs
-_NODE_KIND_MAP: dict[str, tuple[str, bool]] = {
+_NODE_KIND_MAP: dict[str, tuple[int, bool]] = {
     # Python
-    "function_definition": ("function", False),
-    "class_definition":    ("class", True),
+    "function_definition": (_KIND_FUNCTION, False),
+    "class_definition":    (_KIND_CLASS, True),
     # JS / TS
-    "function_declaration":       ("function", False),
-    "arrow_function":             ("function", False),
-    "class_declaration":          ("class", True),
-    "method_definition":          ("method", False),
-    "lexical_declaration":        ("variable", False),
+    "function_declaration":       (_KIND_FUNCTION, False),
+    "arrow_function":             (_KIND_FUNCTION, False),
+    "class_declaration":          (_KIND_CLASS, True),
+    "method_definition":          (_KIND_METHOD, False),
+    "lexical_declaration":        (_KIND_VARIABLE, False),
     # Java
-    "method_declaration":         ("method", False),
-    "constructor_declaration":    ("method", False),
-    "interface_declaration":      ("class", True),
+    "method_declaration":         (_KIND_METHOD, False),
+    "constructor_declaration":    (_KIND_METHOD, False),
+    "interface_declaration":      (_KIND_CLASS, True),
     # Go  (function_declaration already mapped above for JS/TS/Kotlin)
-    "type_spec":                  ("class", False),
+    "type_spec":                  (_KIND_CLASS, False),
     # Rust
-    "function_item":              ("function", False),
-    "struct_item":                ("class", False),
-    "impl_item":                  ("class", True),
-    "enum_item":                  ("class", False),
-    "trait_item":                 ("class", True),
+    "function_item":              (_KIND_FUNCTION, False),
+    "struct_item":                (_KIND_CLASS, False),
+    "impl_item":                  (_KIND_CLASS, True),
+    "enum_item":                  (_KIND_CLASS, False),
+    "trait_item":                 (_KIND_CLASS, True),
     # C / C++
-    "struct_specifier":           ("class", False),
-    "class_specifier":            ("class", True),
+    "struct_specifier":           (_KIND_CLASS, False),
+    "class_specifier":            (_KIND_CLASS, True),
     # Kotlin
-    "object_declaration":         ("class", True),
-    "companion_object":           ("class", True),
+    "object_declaration":         (_KIND_CLASS, True),
+    "companion_object":           (_KIND_CLASS, True),
     # Ruby
-    "method":                     ("method", False),
-    "singleton_method":           ("method", False),
-    "class":                      ("class", True),
-    "module":                     ("class", True),
+    "method":                     (_KIND_METHOD, False),
+    "singleton_method":           (_KIND_METHOD, False),
+    "class":                      (_KIND_CLASS, True),
+    "module":                     (_KIND_CLASS, True),
 }
 
+# ext → _NODE_KIND_MAP restricted to node types that grammar can emit.
+_KIND_MAPS: dict[str, dict[str, tuple[int, bool]]] = {}
+
+
+def _kind_map_for(ext: str) -> dict[str, tuple[int, bool]]:
+    """Return ``_NODE_KIND_MAP`` specialised to the grammar handling *ext*.
+
+    The full map mixes node types from every supported grammar, and the
+    symbol walk does one lookup against it per AST node visited.  Filtering
+    it down to the node kinds this language can actually emit (via the
+    grammar's node-kind table) leaves a dict a few entries deep.
+    """
+    cached = _KIND_MAPS.get(ext)
+    if cached is not None:
+        return cached
+
+    lang = _load_language(ext)
+    if lang is None:
+        specialized = _NODE_KIND_MAP
+    else:
+        known = {lang.node_kind_for_id(i) for i in range(lang.node_kind_count)}
+        specialized = {k: v for k, v in _NODE_KIND_MAP.items() if k in known}
+    _KIND_MAPS[ext] = specialized
+    return specialized
+
 
 def _node_name(node: Node, source: bytes) -> str:
     """Extract the symbol name from a tree-sitter node."""
@@ -258,82 +507,201 @@ def _first_identifier(node: Node, source: bytes) -> str | None:
 # Symbol extraction via tree-sitter
 # ---------------------------------------------------------------------------
 
+@dataclass(slots=True)
+class Symbol:
+    """One extracted symbol, flat with a positional parent link.
+
+    A slotted dataclass rather than a per-symbol dict: a large repo yields
+    hundreds of thousands of these per indexing run, and slots roughly
+    halve the per-instance memory overhead.
+    """
+
+    name: str
+    kind: str
+    line_start: int
+    line_end: int
+    parent_idx: int | None
+    # Span into the source buffer; source_text is materialised from it
+    # after the walk (None for fallback-indexed files, which set
+    # source_text directly).
+    byte_range: tuple[int, int] | None = None
+    source_text: str | None = None
+
+
 def _extract_symbols(
     tree_root: Node,
     source: bytes,
-) -> list[dict[str, Any]]:
+    kind_map: dict[str, tuple[int, bool]] = _NODE_KIND_MAP,
+) -> list[Symbol]:
     """Walk the tree-sitter AST and extract symbols.
 
-    Returns a flat list of dicts with keys:
-      name, kind, line_start, line_end, source_text, parent_idx
-    """
-    symbols: list[dict[str, Any]] = []
+    Returns a flat list of :class:`Symbol` records (source_text left
+    unset; the caller materialises it from ``byte_range``).
 
-    def _walk(node: Node, parent_idx: int | None = None, parent_kind: str | None = None):
-        node_type = node.type
-        mapping = _NODE_KIND_MAP.get(node_type)
+    Args:
+        kind_map: Node-type → (kind, is_container) mapping; pass a
+            per-language map from :func:`_kind_map_for` to keep the hot-path
+            lookup small.
+    """
+    symbols: list[Symbol] = []
+
+    # Iterative preorder DFS with an explicit stack instead of a recursive
+    # closure — one Python frame total rather than one per AST level, and no
+    # recursion-limit concern on deeply nested sources.  Children are pushed
+    # in reverse so pop order matches left-to-right document order.
+    stack: list[tuple[Node, int | None, int]] = [(tree_root, None, _KIND_NONE)]
+    # Bind the per-node lookups once; the loop body runs for every AST node
+    # and LOAD_FAST beats a fresh attribute/global lookup each iteration.
+    kind_map_get = kind_map.get
+    append_symbol = symbols.append
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node, parent_idx, parent_kind = pop()
+        mapping = kind_map_get(node.type)
 
         if mapping:
             kind, is_container = mapping
             # Promote function → method if parent is a class/container
-            if kind == "function" and parent_kind in ("class",):
-                kind = "method"
+            if kind == _KIND_FUNCTION and parent_kind == _KIND_CLASS:
+                kind = _KIND_METHOD
 
-            name = _node_name(node, source)
-            src_text = source[node.start_byte:node.end_byte].decode(
-                "utf-8", errors="replace"
-            )
-            sym = {
-                "name": name,
-                "kind": kind,
-                "line_start": node.start_point[0] + 1,  # 1-indexed
-                "line_end": node.end_point[0] + 1,
-                "source_text": src_text,
-                "parent_idx": parent_idx,
-            }
+            # Record the byte span only; the caller materialises (truncated)
+            # source_text after the walk.  Container nodes span every child
+            # body, so slicing text here would duplicate each method once
+            # per enclosing container.
             current_idx = len(symbols)
-            symbols.append(sym)
-
-            # Recurse into container nodes (classes, impl blocks, etc.)
+            append_symbol(Symbol(
+                name=_node_name(node, source),
+                kind=_KIND_NAMES[kind],
+                line_start=node.start_point[0] + 1,  # 1-indexed
+                line_end=node.end_point[0] + 1,
+                parent_idx=parent_idx,
+                byte_range=(node.start_byte, node.end_byte),
+            ))
+
+            # Descend into container nodes (classes, impl blocks, etc.) only
             if is_container:
-                for child in node.children:
-                    _walk(child, parent_idx=current_idx, parent_kind=kind)
-            return
+                for child in reversed(node.children):
+                    push((child, current_idx, kind))
+            continue
 
-        # Not a symbol node — recurse into children
-        for child in node.children:
-            _walk(child, parent_idx=parent_idx, parent_kind=parent_kind)
+        # Not a symbol node — descend with the same parent context
+        for child in reversed(node.children):
+            push((child, parent_idx, parent_kind))
 
-    _walk(tree_root)
     return symbols
 
 
-def _extract_references(tree_root: Node, source: bytes) -> list[dict[str, Any]]:
-    """Extract identifier references from the tree-sitter AST."""
-    refs: list[dict[str, Any]] = []
-    seen: set[tuple[str, int]] = set()
+# Node types that count as identifier references.
+_IDENT_NODE_TYPES = ("identifier", "name", "type_identifier")
+
+# ext → compiled reference-capture query.  None is cached for grammars that
+# define none of the identifier node types.
+_REF_QUERIES: dict[str, Query | None] = {}
 
-    def _walk(node: Node):
-        if node.type in ("identifier", "name", "type_identifier"):
-            name = source[node.start_byte:node.end_byte].decode(
-                "utf-8", errors="replace"
-            )
-            line = node.start_point[0] + 1
-            key = (name, line)
-            if key not in seen:
-                seen.add(key)
-                refs.append({"name": name, "line": line})
-        for child in node.children:
-            _walk(child)
 
-    _walk(tree_root)
-    return refs
+def _ref_query_for(ext: str) -> Query | None:
+    """Return a compiled tree-sitter query capturing identifier nodes for *ext*.
+
+    A query runs entirely inside tree-sitter's C query engine, so reference
+    discovery avoids a Python-level recursion over every node.  The pattern
+    is assembled per language from the identifier node types its grammar
+    actually defines — referencing an unknown node type is a compile error.
+    """
+    if ext in _REF_QUERIES:
+        return _REF_QUERIES[ext]
+
+    lang = _load_language(ext)
+    query: Query | None = None
+    if lang is not None:
+        known = {lang.node_kind_for_id(i) for i in range(lang.node_kind_count)}
+        node_types = [t for t in _IDENT_NODE_TYPES if t in known]
+        if node_types:
+            if len(node_types) == 1:
+                pattern = f"({node_types[0]}) @ref"
+            else:
+                pattern = "[" + " ".join(f"({t})" for t in node_types) + "] @ref"
+            query = Query(lang, pattern)
+    _REF_QUERIES[ext] = query
+    return query
+
+
+def _extract_references(tree_root: Node, source: bytes, ext: str) -> list[dict[str, Any]]:
+    """Extract identifier references via a precompiled tree-sitter query."""
+    query = _ref_query_for(ext)
+    if query is None:
+        return []
+
+    captures = QueryCursor(query).captures(tree_root)
+
+    # A file has far fewer unique identifier texts than identifier
+    # occurrences, so decode each byte string once and dedupe (name, line)
+    # pairs with an insertion-ordered dict instead of a per-node set probe.
+    # The DB write uses INSERT OR IGNORE, so duplicates were harmless anyway.
+    decoded: dict[bytes, str] = {}
+    pairs: dict[tuple[str, int], None] = {}
+    decoded_get = decoded.get
+    for n in captures.get("ref", ()):
+        raw = source[n.start_byte:n.end_byte]
+        name = decoded_get(raw)
+        if name is None:
+            name = decoded[raw] = raw.decode("utf-8", errors="replace")
+        pairs[(name, n.start_point[0] + 1)] = None
+
+    return [{"name": name, "line": line} for name, line in pairs]
 
 
 # ---------------------------------------------------------------------------
 # Directory indexer
 # ---------------------------------------------------------------------------
 
+def _iter_source_files(dirpath: str, gitignore: GitignoreMatcher):
+    """Yield ``(abs_path, mtime)`` for every indexable file under *dirpath*.
+
+    Iterative ``os.scandir`` walker: ``DirEntry.stat()`` reuses attributes
+    fetched during directory enumeration, so the freshness check downstream
+    needs no extra stat syscall per file.  Applies the same ``SKIP_DIRS``
+    and .gitignore pruning as the previous ``os.walk`` loop.
+    """
+    stack = [(dirpath, ".")]
+    while stack:
+        abs_dir, rel_dir = stack.pop()
+        if rel_dir != ".":
+            gitignore.check_dir_for_gitignore(abs_dir, rel_dir)
+        try:
+            entries = sorted(os.scandir(abs_dir), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            rel_path = name if rel_dir == "." else os.path.join(rel_dir, name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if name in SKIP_DIRS or name.endswith(".egg-info"):
+                    continue
+                if gitignore.should_skip(rel_path, is_dir=True):
+                    continue
+                stack.append((entry.path, rel_path))
+            else:
+                if gitignore.should_skip(rel_path, is_dir=False):
+                    continue
+                # rfind beats os.path.splitext here: one substring instead
+                # of two, and this runs once per file in the tree.  dot > 0
+                # keeps splitext's behaviour of not treating dotfiles like
+                # ".gitignore" as an extension.
+                dot = name.rfind(".")
+                ext = name[dot:].lower() if dot > 0 else ""
+                if _ext_indexable(ext):
+                    try:
+                        yield entry.path, entry.stat().st_mtime
+                    except OSError:
+                        continue
+
+
 def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
     """Recursively index all source files under *dirpath* using parallel processing.
 
@@ -364,65 +732,116 @@ def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
     gitignore = GitignoreMatcher(dirpath)
     logger.debug("Initialized gitignore matcher for %s", dirpath)
 
-    # First pass: collect all files to index
-    total_files = 0
-    file_list = []
-    for root, dirs, files in os.walk(dirpath, topdown=True):
-        rel_root = os.path.relpath(root, dirpath)
-        if rel_root != ".":
-            gitignore.check_dir_for_gitignore(root, rel_root)
-        dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.endswith(".egg-info")
-                   and not gitignore.should_skip(os.path.join(rel_root, d) if rel_root != "." else d, is_dir=True)]
-        for fname in sorted(files):
-            rel_path = os.path.join(rel_root, fname) if rel_root != "." else fname
-            if gitignore.should_skip(rel_path, is_dir=False):
-                continue
-            ext = os.path.splitext(fname)[1].lower()
-            if ext in _SOURCE_EXTENSIONS or _load_language(ext) is not None:
-                file_list.append(os.path.join(root, fname))
-                total_files += 1
+    # First pass: collect all files to index, capturing mtimes from the
+    # scandir enumeration so no later per-file stat is needed
+    file_list: list[str] = []
+    file_mtimes: dict[str, float] = {}
+    for fpath, mtime in _iter_source_files(dirpath, gitignore):
+        file_list.append(fpath)
+        file_mtimes[fpath] = mtime
+    total_files = len(file_list)
 
     if not file_list:
         return []
 
+    # Fast path: fingerprint the tree from data the walk already gathered
+    # (sorted file set, count, newest mtime).  If it matches the signature
+    # recorded after the last fully-successful run, nothing has changed and
+    # the freshness filter, parsing, storage and stale-cleanup phases can
+    # all be skipped.
+    sig_key = f"tree_signature:{dirpath}"
+    signature = db_mod.hash_bytes(
+        "\n".join(sorted(file_list)).encode()
+        + f"|{total_files}|{max(file_mtimes.values())!r}".encode()
+    )
+    row = db.execute(
+        "SELECT value FROM index_metadata WHERE key = ?", (sig_key,)
+    ).fetchone()
+    # A matching signature is only trustworthy while the rows it summarises
+    # still exist; skipping against an index that was emptied underneath it
+    # (e.g. by an embedding-model change) would leave search broken until a
+    # file's mtime changed.
+    tree_indexed = row is not None and row[0] == signature and db.execute(
+        "SELECT 1 FROM files WHERE path LIKE ? LIMIT 1", (dirpath + "%",)
+    ).fetchone() is not None
+    if tree_indexed:
+        logger.info(
+            "Tree unchanged since last index (%d files); skipping re-scan",
+            total_files,
+        )
+        if progress_callback:
+            progress_callback(total_files, total_files, "Index is up to date")
+        return [
+            {"file": fpath, "symbols_indexed": 0, "references_indexed": 0,
+             "skipped": True}
+            for fpath in file_list
+        ]
+
     # Report initial phase
     if progress_callback:
         progress_callback(0, total_files, "Scanning files for changes...")
 
-    # Phase 1: Parallel file freshness check and parsing
-    # Each worker returns parsed data (not yet stored to DB)
-    files_processed = 0
+    # Phase 1: Freshness filter on the main thread, then parallel parsing.
+    # All known mtimes come from a single bulk SELECT (one query instead of
+    # one probe per file), and the stat check runs before dispatch so
+    # unchanged files never occupy a worker slot.  This also keeps every
+    # db.execute() on the main thread — concurrent access to a single
+    # sqlite3.Connection causes sqlite3.InterfaceError even with
+    # check_same_thread=False.
     parsed_files: list[tuple[str, dict | None, Exception | None]] = []  # (filepath, parsed_data, error)
 
-    # Pre-fetch all known file mtimes in the main thread before launching workers.
-    # _parse_file_for_indexing previously called db.execute() inside the thread
-    # pool, which caused sqlite3.InterfaceError ("bad parameter or other API
-    # misuse") on concurrent access even with check_same_thread=False.
-    existing_mtimes: dict[str, float] = {
-        os.path.abspath(row[0]): row[1]
-        for row in db.execute("SELECT path, last_modified FROM files").fetchall()
+    existing_meta: dict[str, tuple[float, str]] = {
+        os.path.abspath(row[0]): (row[1], row[2])
+        for row in db.execute(
+            "SELECT path, last_modified, file_hash FROM files WHERE path LIKE ?",
+            (dirpath + "%",),
+        ).fetchall()
     }
 
+    changed_files: list[str] = []
+    for fpath in file_list:
+        cached = existing_meta.get(fpath)
+        if cached is not None and cached[0] >= file_mtimes[fpath]:
+            parsed_files.append((fpath, {"skipped": True}, None))
+        else:
+            changed_files.append(fpath)
+
+    files_processed = len(parsed_files)
+
     def _parse_file_task(fpath: str) -> tuple[str, dict | None, Exception | None]:
         """Parse a single file and return extracted data (without DB writes)."""
         try:
-            parsed = _parse_file_for_indexing(fpath, db, existing_mtimes)
+            parsed = _parse_file_for_indexing(
+                fpath, db, existing_meta, mtime=file_mtimes.get(fpath)
+            )
             return (fpath, parsed, None)
         except Exception as e:
             return (fpath, None, e)
 
+    # Throttle progress updates: the UI refreshes far less often than files
+    # complete, so report at most every 64 files or 50 ms (plus the final
+    # file) and only compute the basename when actually reporting.
+    last_tick = time.perf_counter()
+
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all parsing tasks
-        future_to_path = {executor.submit(_parse_file_task, fpath): fpath for fpath in file_list}
+        # Submit parsing tasks for changed files only
+        future_to_path = {executor.submit(_parse_file_task, fpath): fpath for fpath in changed_files}
 
         for future in as_completed(future_to_path):
             fpath, parsed_data, error = future.result()
             parsed_files.append((fpath, parsed_data, error))
 
             files_processed += 1
-            if progress_callback:
-                fname = os.path.basename(fpath)
-                progress_callback(files_processed, total_files, f"Parsing: {fname}")
+            if progress_callback and (
+                files_processed == total_files
+                or files_processed & 63 == 0
+                or time.perf_counter() - last_tick > 0.05
+            ):
+                last_tick = time.perf_counter()
+                progress_callback(
+                    files_processed, total_files,
+                    f"Parsing: {os.path.basename(fpath)}",
+                )
 
     # Phase 2: Batch embedding generation (sequential, GIL released during inference)
     if progress_callback:
@@ -437,7 +856,7 @@ def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
 
         embed_inputs = []
         for sym in parsed_data.get("symbols", []):
-            embed_input = f"{sym['kind']} {sym['name']}: {sym['source_text'][:1000]}"
+            embed_input = f"{sym.kind} {sym.name}: {sym.source_text[:1000]}"
             embed_inputs.append(embed_input)
 
         if embed_inputs:
@@ -461,31 +880,61 @@ def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
     if progress_callback:
         progress_callback(total_files, total_files, "Storing to database...")
 
-    for fpath, parsed_data, error in parsed_files:
-        if error:
-            logger.error("Failed to index %s", fpath, exc_info=error)
-            results.append({
-                "file": fpath,
-                "symbols_indexed": 0,
-                "references_indexed": 0,
-                "skipped": True,
-                "error": True,
-            })
-            continue
+    # Files whose content hash matched despite a newer mtime only need
+    # last_modified refreshed; batched into one executemany below.
+    mtime_touches: list[tuple[float, str]] = []
 
-        if parsed_data is None or parsed_data.get("skipped"):
-            results.append({
-                "file": fpath,
-                "symbols_indexed": 0,
-                "references_indexed": 0,
-                "skipped": True,
-            })
-            continue
+    # Group stored files into one transaction per _COMMIT_EVERY_FILES rather
+    # than committing each file; the per-file writes themselves stay in
+    # _store_parsed_file with manage_transaction=False.
+    files_in_txn = 0
+    try:
+        for fpath, parsed_data, error in parsed_files:
+            if error:
+                logger.error("Failed to index %s", fpath, exc_info=error)
+                results.append({
+                    "file": fpath,
+                    "symbols_indexed": 0,
+                    "references_indexed": 0,
+                    "skipped": True,
+                    "error": True,
+                })
+                continue
+
+            if parsed_data is None or parsed_data.get("skipped"):
+                if parsed_data is not None and "touch_mtime" in parsed_data:
+                    mtime_touches.append((parsed_data["touch_mtime"], fpath))
+                results.append({
+                    "file": fpath,
+                    "symbols_indexed": 0,
+                    "references_indexed": 0,
+                    "skipped": True,
+                })
+                continue
 
-        # Find embeddings for this file
-        file_embeddings = file_to_embeddings.get(fpath)
-        file_result = _store_parsed_file(fpath, parsed_data, db, file_embeddings)
-        results.append(file_result)
+            # Find embeddings for this file
+            file_embeddings = file_to_embeddings.get(fpath)
+            if files_in_txn == 0:
+                db.execute("BEGIN")
+            file_result = _store_parsed_file(
+                fpath, parsed_data, db, file_embeddings, manage_transaction=False
+            )
+            files_in_txn += 1
+            if files_in_txn >= _COMMIT_EVERY_FILES:
+                db.commit()
+                files_in_txn = 0
+            results.append(file_result)
+        if files_in_txn:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if mtime_touches:
+        db.executemany(
+            "UPDATE files SET last_modified = ? WHERE path = ?", mtime_touches
+        )
+        db.commit()
 
     # Phase 4: Clean up stale files (deleted from disk but still in index)
     stale_count = 0
@@ -501,6 +950,18 @@ def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
     if stale_count:
         logger.info("Cleaned up %d stale file(s) no longer on disk", stale_count)
 
+    # The reference universe may have changed; drop query-layer caches
+    queries.invalidate_caches()
+
+    # Record the tree signature only when every file made it in, so files
+    # that errored are retried on the next run instead of being skipped.
+    if not any(r.get("error") for r in results):
+        db.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) VALUES (?, ?)",
+            (sig_key, signature),
+        )
+        db.commit()
+
     # Log performance summary
     total_elapsed = time.perf_counter() - total_start
     total_symbols = sum(r.get("symbols_indexed", 0) for r in results)
@@ -523,40 +984,73 @@ def index_directory(dirpath: str, db, progress_callback=None) -> list[dict]:
     return results
 
 
-def _parse_file_for_indexing(filepath: str, db, existing_mtimes: dict | None = None) -> dict | None:
+def _parse_file_for_indexing(
+    filepath: str, db, existing_meta: dict | None = None, mtime: float | None = None
+) -> dict | None:
     """Parse a file and extract symbols/references without DB writes.
 
     Returns parsed data structure or None if skipped.
 
     Args:
-        existing_mtimes: Optional pre-fetched mapping of abs-path → last_modified
-            from the files table. When provided, the freshness check uses a dict
-            lookup instead of a db.execute() call, which is required when this
-            function runs inside a ThreadPoolExecutor worker — concurrent access
-            to a single sqlite3.Connection causes InterfaceError even with
+        existing_meta: Optional pre-fetched mapping of abs-path →
+            (last_modified, file_hash) from the files table. When provided,
+            the freshness check uses a dict lookup instead of a db.execute()
+            call, which is required when this function runs inside a
+            ThreadPoolExecutor worker — concurrent access to a single
+            sqlite3.Connection causes InterfaceError even with
             check_same_thread=False.
+        mtime: Optional mtime captured during the directory walk; passing it
+            skips a redundant stat syscall here.
     """
     filepath = os.path.abspath(filepath)
     ext = os.path.splitext(filepath)[1].lower()
 
     # Check freshness — use pre-fetched dict when available to avoid cross-thread DB access
-    mtime = os.path.getmtime(filepath)
-    if existing_mtimes is not None:
-        cached_mtime = existing_mtimes.get(filepath)
-        if cached_mtime is not None and cached_mtime >= mtime:
-            return {"skipped": True}
+    if mtime is None:
+        mtime = os.path.getmtime(filepath)
+    cached_hash: str | None = None
+    if existing_meta is not None:
+        cached = existing_meta.get(filepath)
+        if cached is not None:
+            if cached[0] >= mtime:
+                return {"skipped": True}
+            cached_hash = cached[1]
     else:
         row = db.execute(
-            "SELECT id, last_modified FROM files WHERE path = ?", (filepath,)
+            "SELECT id, last_modified, file_hash FROM files WHERE path = ?",
+            (filepath,),
         ).fetchone()
-        if row and row[1] >= mtime:
-            return {"skipped": True, "file_id": row[0]}
+        if row:
+            if row[1] >= mtime:
+                return {"skipped": True, "file_id": row[0]}
+            cached_hash = row[2]
+
+    lang = _load_language(ext)
+
+    # Read file — tree-sitter consumes raw bytes, so no full-file decode;
+    # only the small prefix stored by the fallback path gets decoded.
+    # Large parseable files are memory-mapped instead of copied into a bytes
+    # object: tree-sitter parses straight from the mapping and the slices
+    # taken during extraction come back as real bytes, so nothing outlives
+    # the map.
+    mm: mmap.mmap | None = None
+    if lang is not None and os.path.getsize(filepath) > _MMAP_THRESHOLD:
+        with open(filepath, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        source_bytes = mm
+    else:
+        source_bytes = Path(filepath).read_bytes()
 
-    # Read file
-    source_bytes = Path(filepath).read_bytes()
-    source_text = source_bytes.decode("utf-8", errors="replace")
+    # Hash the bytes already in hand rather than re-reading the file
+    fhash = db_mod.hash_bytes(source_bytes)
 
-    fhash = db_mod.file_hash(filepath)
+    # The mtime moved but the content did not (git checkout, touch, etc.):
+    # skip the parse/embed/store pipeline entirely and just let the caller
+    # bump last_modified so the next run's mtime check passes again.
+    if cached_hash is not None and cached_hash == fhash:
+        if mm is not None:
+            mm.close()
+        return {"skipped": True, "touch_mtime": mtime}
 
     result = {
         "skipped": False,
@@ -567,30 +1061,50 @@ def _parse_file_for_indexing(filepath: str, db, existing_mtimes: dict | None = N
         "fallback": False,
     }
 
-    # Try tree-sitter parsing
-    lang = _load_language(ext)
-
     if lang is not None:
-        parser = Parser(lang)
-        tree = parser.parse(source_bytes)
-
-        # Extract symbols (flat list natively)
-        result["symbols"] = _extract_symbols(tree.root_node, source_bytes)
-
-        # Extract references
-        refs = _extract_references(tree.root_node, source_bytes)
-        result["references"] = refs
+        try:
+            parser = _get_parser(ext)
+            tree = _parse_source(parser, filepath, source_bytes, fhash)
+
+            # Extract symbols (flat list natively), then materialise their
+            # source text from the recorded byte spans — one truncated
+            # decode per symbol, done before the mmap (if any) is closed.
+            symbols = _extract_symbols(tree.root_node, source_bytes, _kind_map_for(ext))
+            for sym in symbols:
+                start, end = sym.byte_range
+                end = min(end, start + _MAX_SYMBOL_SOURCE_BYTES)
+                sym.source_text = source_bytes[start:end].decode(
+                    "utf-8", errors="replace"
+                )
+            result["symbols"] = symbols
+
+            # Extract references — unless the file looks like generated or
+            # minified output, where per-identifier rows are pure noise
+            size = len(source_bytes)
+            density = size / max(_count_newlines(source_bytes), 1)
+            if size > _MAX_REF_FILE_BYTES or density > _MINIFIED_BYTES_PER_LINE:
+                logger.debug(
+                    "Skipping reference extraction for %s "
+                    "(%d bytes, %.0f bytes/line)",
+                    filepath, size, density,
+                )
+            else:
+                refs = _extract_references(tree.root_node, source_bytes, ext)
+                result["references"] = refs
+        finally:
+            if mm is not None:
+                mm.close()
     else:
         # Fallback: entire file as one symbol
         basename = os.path.basename(filepath)
-        result["symbols"] = [{
-            "name": basename,
-            "kind": "file",
-            "line_start": 1,
-            "line_end": source_text.count("\n") + 1,
-            "source_text": source_text[:5000],
-            "parent_idx": None,
-        }]
+        result["symbols"] = [Symbol(
+            name=basename,
+            kind="file",
+            line_start=1,
+            line_end=source_bytes.count(b"\n") + 1,
+            parent_idx=None,
+            source_text=source_bytes[:5000].decode("utf-8", errors="replace"),
+        )]
         result["fallback"] = True
 
     return result
@@ -600,19 +1114,26 @@ def _store_parsed_file(
     filepath: str,
     parsed_data: dict,
     db,
-    file_embeddings: list | None
+    file_embeddings: list | None,
+    manage_transaction: bool = True,
 ) -> dict:
     """Store parsed file data to database with pre-computed embeddings.
 
     Uses a single transaction for all writes and batch inserts for
     embeddings and references to minimise SQLite round-trips.
+
+    Args:
+        manage_transaction: When True (the default) the writes run in their
+            own transaction. :func:`index_directory` passes False and groups
+            many files per transaction to cut commit frequency.
     """
     filepath = os.path.abspath(filepath)
 
     symbols_indexed = 0
     references_indexed = 0
 
-    with db_mod.transaction(db):
+    ctx = db_mod.transaction(db) if manage_transaction else nullcontext()
+    with ctx:
         # Upsert file record (inside the transaction)
         file_id = db_mod.upsert_file(
             db, filepath, parsed_data["mtime"], parsed_data["fhash"],
@@ -622,43 +1143,65 @@ def _store_parsed_file(
         # Delete stale data
         db_mod.delete_file_data(db, file_id, auto_commit=False)
 
-        # Store symbols. tree-sitter can produce duplicate (name, kind,
-        # line_start) tuples for a single file; use INSERT OR IGNORE so a
-        # duplicate does not abort the transaction.
+        # Store symbols in one executemany batch instead of a per-symbol
+        # execute loop.  Parent links reference list positions that only get
+        # database ids after the insert, so parents are inserted as NULL and
+        # backpatched with a second (much smaller) executemany UPDATE.
         #
-        # NOTE: cursor.lastrowid is NOT reset to 0 after a no-op INSERT OR
-        # IGNORE — it retains the rowid from the previous successful insert on
-        # this connection. Use cursor.rowcount == 1 to detect a real insert.
+        # tree-sitter can produce duplicate (name, kind, line_start) tuples
+        # for a single file; dedupe up front so the batch insert and the
+        # id-mapping SELECT line up one-to-one.
         #
         # NOTE: symbol_embeddings is a sqlite-vec virtual table and does not
         # support conflict-resolution clauses (INSERT OR IGNORE raises
-        # OperationalError). Never attempt to insert an embedding for a symbol
-        # that was not freshly inserted.
+        # OperationalError). Only insert one embedding per unique symbol row.
         embedding_pairs: list[tuple[int, list[float]]] = []
 
-        if parsed_data.get("symbols"):
-            db_ids: dict[int, int] = {}
-            for i, sym in enumerate(parsed_data["symbols"]):
-                parent_id = db_ids.get(sym["parent_idx"]) if sym["parent_idx"] is not None else None
-                cursor = db.execute(
-                    """INSERT OR IGNORE INTO symbols
-                           (name, kind, file_id, line_start, line_end,
-                            parent_symbol_id, source_text)
-                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                    (sym["name"], sym["kind"], file_id,
-                     sym["line_start"], sym["line_end"],
-                     parent_id, sym["source_text"]),
+        symbols = parsed_data.get("symbols") or []
+        if symbols:
+            keys = [(sym.name, sym.kind, sym.line_start) for sym in symbols]
+            first_occurrence: dict[tuple, int] = {}
+            symbol_rows = []
+            for i, sym in enumerate(symbols):
+                if keys[i] in first_occurrence:
+                    continue
+                first_occurrence[keys[i]] = i
+                symbol_rows.append((
+                    sym.name, sym.kind, file_id,
+                    sym.line_start, sym.line_end,
+                    None, sym.source_text,
+                ))
+            db_mod.upsert_symbols_many(db, symbol_rows)
+
+            # Map keys back to database ids with a single SELECT (stale rows
+            # were deleted above, so every row belongs to this batch).
+            id_by_key = {
+                (name, kind, line_start): sym_id
+                for sym_id, name, kind, line_start in db.execute(
+                    "SELECT id, name, kind, line_start FROM symbols WHERE file_id = ?",
+                    (file_id,),
                 )
-                is_new = cursor.rowcount == 1
-                sym_id = cursor.lastrowid if is_new else db.execute(
-                    "SELECT id FROM symbols WHERE file_id=? AND name=? AND kind=? AND line_start=?",
-                    (file_id, sym["name"], sym["kind"], sym["line_start"]),
-                ).fetchone()[0]
-                db_ids[i] = sym_id
-
-                if is_new and file_embeddings and i < len(file_embeddings):
-                    embedding_pairs.append((sym_id, file_embeddings[i]))
-                symbols_indexed += 1
+            }
+            db_ids = {i: id_by_key[keys[i]] for i in range(len(symbols))}
+
+            parent_updates = [
+                (db_ids[symbols[i].parent_idx], db_ids[i])
+                for i in first_occurrence.values()
+                if symbols[i].parent_idx is not None
+            ]
+            if parent_updates:
+                db.executemany(
+                    "UPDATE symbols SET parent_symbol_id = ? WHERE id = ?",
+                    parent_updates,
+                )
+
+            if file_embeddings:
+                embedding_pairs = [
+                    (db_ids[i], file_embeddings[i])
+                    for i in first_occurrence.values()
+                    if i < len(file_embeddings)
+                ]
+            symbols_indexed = len(symbols)
 
         # Batch-insert all embeddings in one executemany call
         if embedding_pairs:
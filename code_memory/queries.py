@@ -8,8 +8,19 @@ structure.
 
 from __future__ import annotations
 
+import collections
+import functools
+import heapq
+import json
 import logging
-import struct
+import mmap
+import operator
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 from . import db as db_mod
 from . import validation as val
@@ -22,86 +33,185 @@ logger = logging.getLogger(__name__)
 
 _RRF_K = 60  # standard RRF constant
 
+# Theoretical max RRF score: 1/(k+1) per source, 2/(k+1) for a hybrid hit
+_MAX_SINGLE_RRF = 1.0 / (_RRF_K + 1)  # ≈ 0.01639
+_MAX_HYBRID_RRF = 2.0 * _MAX_SINGLE_RRF  # ≈ 0.03279
+
+# Combined candidate-list size above which RRF accumulation switches to the
+# vectorised NumPy path; below it the array setup costs more than the plain
+# dict loop.
+_RRF_NUMPY_MIN = 32
+
+# Per-rank RRF contributions, precomputed so the fusion loop never divides.
+# Sized well past the 50-row leg limit; ranks beyond it fall back to the
+# formula.
+_RRF_WEIGHTS = tuple(1.0 / (_RRF_K + r) for r in range(1, 129))
+_RRF_WEIGHTS_NP = np.array(_RRF_WEIGHTS)
+
+
+def _rrf_scores(bm25_ids: list[int], vec_ids: list[int]) -> dict[int, float]:
+    """Fuse two ranked id lists into RRF scores keyed by id.
+
+    ``rrf_score(d) = Σ 1 / (k + rank(d))`` over the legs that returned *d*.
+    Large candidate sets use a vectorised unique/bincount reduction; small
+    ones stay on the dict loop, which wins there.
+    """
+    if len(bm25_ids) + len(vec_ids) >= _RRF_NUMPY_MIN:
+        ids = np.concatenate([
+            np.asarray(bm25_ids, dtype=np.int64),
+            np.asarray(vec_ids, dtype=np.int64),
+        ])
+        weights = np.concatenate([
+            _rrf_weights_np(len(bm25_ids)),
+            _rrf_weights_np(len(vec_ids)),
+        ])
+        uniq, inv = np.unique(ids, return_inverse=True)
+        fused = np.bincount(inv, weights=weights)
+        return dict(zip(uniq.tolist(), fused.tolist()))
+
+    scores: dict[int, float] = collections.defaultdict(float)
+    for sid, weight in zip(bm25_ids, _rrf_weights(len(bm25_ids))):
+        scores[sid] += weight
+    for sid, weight in zip(vec_ids, _rrf_weights(len(vec_ids))):
+        scores[sid] += weight
+    return scores
+
+
+def _rrf_weights(n: int) -> tuple[float, ...]:
+    """Return the first *n* per-rank RRF contributions."""
+    if n <= len(_RRF_WEIGHTS):
+        return _RRF_WEIGHTS[:n]
+    return tuple(1.0 / (_RRF_K + r) for r in range(1, n + 1))
+
+
+def _rrf_weights_np(n: int) -> np.ndarray:
+    """NumPy view of :func:`_rrf_weights` for the vectorised path."""
+    if n <= len(_RRF_WEIGHTS_NP):
+        return _RRF_WEIGHTS_NP[:n]
+    return 1.0 / (_RRF_K + np.arange(1, n + 1))
+
+
+@functools.lru_cache(maxsize=256)
+def _embed_query_blob(query: str) -> bytes:
+    """Embed *query* and quantize it to the stored blob format, with an LRU.
+
+    The model forward pass dominates query latency, and the same query
+    string recurs often — retries, pagination, and discover_topic running
+    code and documentation search back to back — so identical queries skip
+    the model entirely.
+    """
+    return db_mod.quantize_embedding(db_mod.embed_text(query))
+
+
+# Executor for running the two retrieval legs of a hybrid search in
+# parallel; two workers, one per leg.  Each worker thread keeps its own
+# reader connection per database path (_READER_CONNS) because a single
+# sqlite3.Connection cannot execute two statements at once.
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cm-search")
+_READER_CONNS = threading.local()
+
+
+def _reader_db(db_path: str):
+    """Return this thread's reader connection for *db_path*, opening it once."""
+    by_path: dict | None = getattr(_READER_CONNS, "by_path", None)
+    if by_path is None:
+        by_path = _READER_CONNS.by_path = {}
+    conn = by_path.get(db_path)
+    if conn is None:
+        conn = by_path[db_path] = db_mod.open_reader(db_path)
+    return conn
+
+
+def _run_search_legs(bm25_fn, vec_fn, query: str, db, top_k: int) -> tuple[list[tuple], list[tuple]]:
+    """Run the BM25 and vector legs of a hybrid search concurrently.
+
+    The legs have no data dependency, and both SQLite scans and embedding
+    inference release the GIL, so overlapping them cuts query wall time to
+    roughly max(bm25, vector) instead of their sum.  In-memory databases
+    cannot be reopened by path, so they fall back to running the legs
+    sequentially on the caller's connection.
+    """
+    db_path = db.execute("PRAGMA database_list").fetchone()[2]
+    if not db_path:
+        return bm25_fn(query, db, top_k=top_k), vec_fn(query, db, top_k=top_k)
+
+    bm25_future = _SEARCH_EXECUTOR.submit(
+        lambda: bm25_fn(query, _reader_db(db_path), top_k=top_k)
+    )
+    vec_future = _SEARCH_EXECUTOR.submit(
+        lambda: vec_fn(query, _reader_db(db_path), top_k=top_k)
+    )
+    return bm25_future.result(), vec_future.result()
+
+
+# Both code-search legs return raw ranked rows in this shared column order;
+# hybrid_search materialises dicts only for the top_k survivors instead of
+# allocating an 8-key dict per candidate.  The BM25 leg appends a ninth
+# column: the FTS5 snippet() fragment used for match_highlights.
+#   (symbol_id, name, kind, file_path, line_start, line_end, source_text, leg_score)
+
+# Module-level SQL constants keep the statement text byte-identical across
+# calls, so the per-connection prepared-statement cache always hits.
+_BM25_SQL = """
+SELECT s.id, s.name, s.kind, f.path, s.line_start, s.line_end,
+       s.source_text, bm25(symbols_fts, 10.0, 1.0) AS score,
+       snippet(symbols_fts, 1, '>>>', '<<<', '...', 20) AS snip
+FROM symbols_fts
+JOIN symbols s ON s.id = symbols_fts.rowid
+JOIN files   f ON f.id = s.file_id
+WHERE symbols_fts MATCH ?
+ORDER BY score          -- bm25() returns negative; lower = better
+LIMIT ?
+"""
+
+_VEC_SQL = """
+SELECT s.id, s.name, s.kind, f.path, s.line_start, s.line_end,
+       s.source_text, se.distance
+FROM symbol_embeddings se
+JOIN symbols s ON s.id = se.symbol_id
+JOIN files   f ON f.id = s.file_id
+WHERE se.embedding MATCH ?
+AND   se.k = ?
+ORDER BY se.distance
+"""
+
 
-def _bm25_search(query: str, db, top_k: int = 50) -> list[dict]:
+def _bm25_search(query: str, db, top_k: int = 25) -> list[tuple]:
     """Run FTS5 BM25 search against ``symbols_fts``.
 
-    Returns a ranked list of dicts with ``symbol_id`` and ``bm25_score``.
+    Returns ranked raw rows (see column order above); the leg score is the
+    bm25() value, with name matches weighted 10x over source_text so a
+    smaller candidate list carries the same signal.  The highlight snippet
+    is computed in the same statement, so no follow-up FTS query is needed.
     """
     # FTS5 MATCH query — escape double-quotes and special characters in user input
     safe_query = val.sanitize_fts_query(query)
     try:
-        rows = db.execute(
-            """
-            SELECT s.id, s.name, s.kind, f.path, s.line_start, s.line_end,
-                   s.source_text, bm25(symbols_fts) AS score
-            FROM symbols_fts
-            JOIN symbols s ON s.id = symbols_fts.rowid
-            JOIN files   f ON f.id = s.file_id
-            WHERE symbols_fts MATCH ?
-            ORDER BY score          -- bm25() returns negative; lower = better
-            LIMIT ?
-            """,
-            (safe_query, top_k),
-        ).fetchall()
-    except Exception as exc:
+        rows: list[tuple] = db.execute(_BM25_SQL, (safe_query, top_k)).fetchall()
+        return rows
+    except sqlite3.OperationalError as exc:
         # FTS MATCH can fail on certain queries (e.g. operators only)
         logger.warning("BM25 code search failed for query %r: %s", query, exc)
         return []
 
-    return [
-        {
-            "symbol_id": r[0],
-            "name": r[1],
-            "kind": r[2],
-            "file_path": r[3],
-            "line_start": r[4],
-            "line_end": r[5],
-            "source_text": r[6],
-            "bm25_score": r[7],
-        }
-        for r in rows
-    ]
 
-
-def _vector_search(query: str, db, top_k: int = 50) -> list[dict]:
+def _vector_search(query: str, db, top_k: int = 25,
+                   query_blob: bytes | None = None) -> list[tuple]:
     """Run dense vector nearest-neighbour search via ``sqlite-vec``.
 
-    Returns a ranked list of dicts with ``symbol_id`` and ``vec_distance``.
+    Returns ranked raw rows (see column order above); the leg score is the
+    vector distance.  Callers that already hold the quantized query
+    embedding can pass it as *query_blob* to skip the model entirely.
     """
-    query_vec = db_mod.embed_text(query)
-    query_blob = struct.pack(f"{len(query_vec)}f", *query_vec)
+    if query_blob is None:
+        query_blob = _embed_query_blob(query)
 
-    rows = db.execute(
-        """
-        SELECT se.symbol_id, se.distance,
-               s.name, s.kind, f.path, s.line_start, s.line_end, s.source_text
-        FROM symbol_embeddings se
-        JOIN symbols s ON s.id = se.symbol_id
-        JOIN files   f ON f.id = s.file_id
-        WHERE se.embedding MATCH ?
-        AND   se.k = ?
-        ORDER BY se.distance
-        """,
-        (query_blob, top_k),
-    ).fetchall()
-
-    return [
-        {
-            "symbol_id": r[0],
-            "vec_distance": r[1],
-            "name": r[2],
-            "kind": r[3],
-            "file_path": r[4],
-            "line_start": r[5],
-            "line_end": r[6],
-            "source_text": r[7],
-        }
-        for r in rows
-    ]
+    rows: list[tuple] = db.execute(_VEC_SQL, (query_blob, top_k)).fetchall()
+    return rows
 
 
-def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True) -> list[dict]:
+def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True,
+                  query_blob: bytes | None = None) -> list[dict]:
     """Hybrid BM25 + vector search with Reciprocal Rank Fusion.
 
     Runs both retrieval legs independently, then merges their ranked lists
@@ -114,60 +224,51 @@ def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True) -> list[
         db: An open ``sqlite3.Connection`` from ``db.get_db()``.
         top_k: Number of results to return.
         rerank: If True (default), apply cross-encoder reranking when available.
+        query_blob: Optional precomputed quantized embedding of *query*;
+            when given, the vector leg skips embedding inference.
 
     Returns:
         A list of result dicts sorted by descending RRF score (or rerank score),
         including match_reason, match_highlights, and confidence.
     """
-    bm25_results = _bm25_search(query, db, top_k=50)
-    vec_results = _vector_search(query, db, top_k=50)
-
-    # Build RRF score map keyed by symbol_id
-    scores: dict[int, float] = {}
-    details: dict[int, dict] = {}
-    match_sources: dict[int, list[str]] = {}  # Track which search found each result
-
-    for rank, r in enumerate(bm25_results, start=1):
-        sid = r["symbol_id"]
-        scores[sid] = scores.get(sid, 0.0) + 1.0 / (_RRF_K + rank)
-        details[sid] = {
-            "name": r["name"],
-            "kind": r["kind"],
-            "file_path": r["file_path"],
-            "line_start": r["line_start"],
-            "line_end": r["line_end"],
-            "source_text": r["source_text"],
-        }
-        match_sources[sid] = match_sources.get(sid, [])
-        match_sources[sid].append("bm25")
-
-    for rank, r in enumerate(vec_results, start=1):
-        sid = r["symbol_id"]
-        scores[sid] = scores.get(sid, 0.0) + 1.0 / (_RRF_K + rank)
-        if sid not in details:
-            details[sid] = {
-                "name": r["name"],
-                "kind": r["kind"],
-                "file_path": r["file_path"],
-                "line_start": r["line_start"],
-                "line_end": r["line_end"],
-                "source_text": r["source_text"],
-            }
-        match_sources[sid] = match_sources.get(sid, [])
-        if "vector" not in match_sources[sid]:
-            match_sources[sid].append("vector")
+    # Embed on the caller's thread so the worker legs never race the model,
+    # and so a precomputed blob short-circuits inference entirely.
+    if query_blob is None:
+        query_blob = _embed_query_blob(query)
+    bm25_results, vec_results = _run_search_legs(
+        _bm25_search,
+        functools.partial(_vector_search, query_blob=query_blob),
+        query, db, top_k=25,
+    )
+
+    # Fuse rankings; keep only the raw row per candidate and defer dict
+    # construction to the top_k survivors below
+    scores = _rrf_scores(
+        [r[0] for r in bm25_results],
+        [r[0] for r in vec_results],
+    )
+    rows_by_id: dict[int, tuple] = {}
+    # Track which search found each result; sets make the membership checks
+    # below O(1) and deduplicate within a leg for free
+    match_sources: dict[int, set[str]] = collections.defaultdict(set)
+
+    for r in bm25_results:
+        rows_by_id[r[0]] = r
+        match_sources[r[0]].add("bm25")
 
-    # Sort by descending RRF score
-    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+    for r in vec_results:
+        sid = r[0]
+        rows_by_id.setdefault(sid, r)
+        match_sources[sid].add("vector")
 
-    # Theoretical max RRF score: 1/(k+1) per source, 2/(k+1) for hybrid
-    max_single_rrf = 1.0 / (_RRF_K + 1)  # ≈ 0.01639
-    max_hybrid_rrf = 2.0 * max_single_rrf  # ≈ 0.03279
+    # Top-k by descending RRF score — a bounded heap selection instead of
+    # sorting all ~50 fused candidates for the 10 that survive
+    ranked = heapq.nlargest(top_k, scores.items(), key=operator.itemgetter(1))
 
     # Build results with match metadata
     results = []
     for sid, raw_score in ranked:
-        sources = match_sources.get(sid, [])
+        sources = match_sources[sid]
         is_hybrid = len(sources) == 2
 
         # Determine match reason
@@ -181,7 +282,7 @@ def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True) -> list[
         # Normalize score to 0-100 range for human readability.
         # Raw RRF scores are always tiny (~0.01-0.03) which is misleading as
         # a relevance indicator. Normalize against the theoretical maximum.
-        max_rrf = max_hybrid_rrf if is_hybrid else max_single_rrf
+        max_rrf = _MAX_HYBRID_RRF if is_hybrid else _MAX_SINGLE_RRF
         normalized_score = min(100.0, (raw_score / max_rrf) * 100.0)
 
         # Confidence: normalized score as 0-1 fraction.
@@ -189,19 +290,24 @@ def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True) -> list[
         # if it's rank #1 in that source.
         confidence = round(normalized_score / 100.0, 3)
 
+        row = rows_by_id[sid]
         result = {
             "symbol_id": sid,
-            **details[sid],
+            "name": row[1],
+            "kind": row[2],
+            "file_path": row[3],
+            "line_start": row[4],
+            "line_end": row[5],
+            "source_text": row[6],
             "score": round(normalized_score, 1),
             "match_reason": match_reason,
             "confidence": confidence,
             "match_highlights": [],  # Will be populated below if BM25 match
         }
 
-        # Get highlights for BM25 matches using FTS5 highlight function
+        # Highlights ride along as the snippet() column of the BM25 row
         if "bm25" in sources:
-            highlights = _get_bm25_highlights(query, details[sid]["source_text"], db)
-            result["match_highlights"] = highlights
+            result["match_highlights"] = _clean_snippet(row[8])
 
         results.append(result)
 
@@ -212,63 +318,18 @@ def hybrid_search(query: str, db, top_k: int = 10, rerank: bool = True) -> list[
     return results
 
 
-def _get_bm25_highlights(query: str, source_text: str, db) -> list[str]:
-    """Extract highlighted snippets using FTS5.
+def _clean_snippet(fragment: str | None) -> list[str]:
+    """Turn a raw FTS5 ``snippet()`` fragment into match_highlights.
 
-    Returns up to 3 highlighted text snippets showing where the query matched.
+    Rewrites the ``>>>``/``<<<`` markers for readability and drops empty or
+    trivially short fragments.
     """
-    if not source_text or not query:
+    if not fragment or fragment == "...":
         return []
-
-    # Use FTS5 highlight function to get matched portions safely
-    safe_query = val.sanitize_fts_query(query)
-    try:
-        # Create a temporary FTS5 query to get highlights
-        # We use the snippet function which returns highlighted fragments
-        rows = db.execute(
-            """
-            SELECT snippet(symbols_fts, 1, '>>>', '<<<', '...', 20) as highlight
-            FROM symbols_fts
-            WHERE symbols_fts MATCH ?
-            LIMIT 3
-            """,
-            (safe_query,),
-        ).fetchall()
-
-        highlights = []
-        for row in rows:
-            if row[0] and row[0] not in ("...", ""):
-                # Clean up the highlight markers for readability
-                highlight = row[0].replace(">>>", "**").replace("<<<", "**")
-                if len(highlight) > 10:  # Only include meaningful highlights
-                    highlights.append(highlight)
-
-        return highlights[:3]  # Return at most 3 highlights
-    except Exception:
-        # Fallback: find query terms in source text
-        return _simple_highlights(query, source_text)
-
-
-def _simple_highlights(query: str, source_text: str) -> list[str]:
-    """Simple fallback highlight extraction when FTS5 isn't available."""
-    highlights = []
-    query_terms = query.lower().split()
-    lines = source_text.split("\n")
-
-    for line in lines[:20]:  # Check first 20 lines
-        line_lower = line.lower()
-        for term in query_terms:
-            if term in line_lower and len(line.strip()) > 10:
-                # Truncate long lines
-                snippet = line.strip()[:100]
-                if len(snippet) > 50:
-                    snippet = snippet[:97] + "..."
-                highlights.append(snippet)
-                break
-        if len(highlights) >= 3:
-            break
-
-    return highlights[:3]
+    fragment = fragment.replace(">>>", "**").replace("<<<", "**")
+    if len(fragment) <= 10:  # Only include meaningful highlights
+        return []
+    return [fragment]
 
 
 # ---------------------------------------------------------------------------
@@ -292,11 +353,41 @@ def find_definition(symbol_name: str, db, include_context: bool = True,
     Returns:
         A list of result dicts with enriched information.
     """
-    results = hybrid_search(symbol_name, db, top_k=20, rerank=rerank)
-
-    # Exact-match filter (case-sensitive)
-    exact = [r for r in results if r["name"] == symbol_name]
-    matched = exact if exact else results[:5]
+    # Exact-name probe first: an indexed equality lookup answers the common
+    # case with no embedding call or FTS scan.  Hybrid search only runs as
+    # the fuzzy fallback when the name matches nothing verbatim.
+    exact_rows = db.execute(
+        """
+        SELECT s.id, s.name, s.kind, f.path, s.line_start, s.line_end,
+               s.source_text
+        FROM symbols s
+        JOIN files f ON f.id = s.file_id
+        WHERE s.name = ?
+        LIMIT 20
+        """,
+        (symbol_name,),
+    ).fetchall()
+    if exact_rows:
+        matched = [
+            {
+                "symbol_id": r[0],
+                "name": r[1],
+                "kind": r[2],
+                "file_path": r[3],
+                "line_start": r[4],
+                "line_end": r[5],
+                "source_text": r[6],
+                "score": 100.0,
+                "match_reason": "exact name match",
+                "confidence": 1.0,
+                "match_highlights": [],
+            }
+            for r in exact_rows
+        ]
+    else:
+        # Best guesses from hybrid retrieval
+        results = hybrid_search(symbol_name, db, top_k=20, rerank=rerank)
+        matched = results[:5]
 
     if not include_context:
         return matched
@@ -326,14 +417,18 @@ def find_definition(symbol_name: str, db, include_context: bool = True,
             if parent_row and parent_row[0]:
                 enriched_result["parent"] = {"name": parent_row[0], "kind": parent_row[1]}
 
-        # Get docstring from doc_chunks
+        # Get docstring from doc_chunks.  The scalar subselect resolves the
+        # doc file first so the span filter can run on
+        # idx_doc_chunks_file_span instead of scanning chunks.
         doc_row = db.execute(
             """
             SELECT dc.content
             FROM doc_chunks dc
-            JOIN doc_files df ON df.id = dc.doc_file_id
-            WHERE df.path = ? AND dc.line_start <= ? AND dc.line_end >= ?
-            AND df.doc_type = 'docstring'
+            WHERE dc.doc_file_id = (
+                SELECT id FROM doc_files
+                WHERE path = ? AND doc_type = 'docstring'
+            )
+            AND dc.line_start <= ? AND dc.line_end >= ?
             LIMIT 1
             """,
             (r["file_path"], r["line_start"], r["line_start"]),
@@ -369,6 +464,45 @@ def _extract_signature(source_text: str) -> str | None:
     return first_line if first_line else None
 
 
+# Lazily-populated sets of every distinct referenced name, keyed by
+# database path, used to answer lookups for unknown symbols (a common
+# failure mode for LLM-driven tools) without touching the database.
+# Reset by invalidate_caches() after indexing runs.
+_known_refs: dict[str, set[str]] = {}
+_known_refs_lock = threading.Lock()
+
+
+def invalidate_caches() -> None:
+    """Drop query-layer caches that mirror database contents.
+
+    Called by the indexing pipeline after it writes new symbols or
+    references, so stale negative lookups don't outlive a reindex.
+    """
+    with _known_refs_lock:
+        _known_refs.clear()
+
+
+def _reference_exists(symbol_name: str, db) -> bool:
+    """Cheap membership probe against the set of known referenced names.
+
+    In-memory databases have no stable path to key the cache by, so they
+    skip the prefilter and let the indexed lookup answer directly.
+    """
+    db_path = db.execute("PRAGMA database_list").fetchone()[2]
+    if not db_path:
+        return True
+    refs = _known_refs.get(db_path)
+    if refs is None:
+        with _known_refs_lock:
+            refs = _known_refs.get(db_path)
+            if refs is None:
+                rows = db.execute(
+                    "SELECT DISTINCT symbol_name FROM references_"
+                ).fetchall()
+                refs = _known_refs[db_path] = {r[0] for r in rows}
+    return symbol_name in refs
+
+
 def find_references(symbol_name: str, db, include_context: bool = True) -> list[dict]:
     """Find all cross-references to *symbol_name*.
 
@@ -382,6 +516,9 @@ def find_references(symbol_name: str, db, include_context: bool = True) -> list[
     Returns:
         A list of dicts with enriched reference information.
     """
+    if not _reference_exists(symbol_name, db):
+        return []
+
     rows = db.execute(
         """
         SELECT r.symbol_name, f.path, r.line_number
@@ -399,9 +536,60 @@ def find_references(symbol_name: str, db, include_context: bool = True) -> list[
             for r in rows
         ]
 
-    # Enrich with context
+    # Enrich with context.  Containing-symbol candidates for every
+    # referenced file come from a single IN-list query instead of one
+    # probe per reference row, so the SQLite round-trip count stays at two
+    # regardless of how widely the symbol is referenced.
+    paths = sorted({r[1] for r in rows})
+    symbols_by_path: dict[str, list[tuple]] = {}
+    if paths:
+        placeholders = ",".join("?" * len(paths))
+        for path, name, kind, line_start, line_end in db.execute(
+            f"""
+            SELECT f.path, s.name, s.kind, s.line_start, s.line_end
+            FROM symbols s
+            JOIN files f ON f.id = s.file_id
+            WHERE f.path IN ({placeholders})
+            """,
+            paths,
+        ):
+            symbols_by_path.setdefault(path, []).append(
+                (name, kind, line_start, line_end)
+            )
+
+    # Referenced source lines come from one read-only mmap per file with a
+    # newline-offset table built on first touch; only the lines actually
+    # referenced get sliced and decoded, instead of readlines() turning the
+    # whole file into Python strings.
+    file_cache: dict[str, tuple[mmap.mmap, list[int]] | None] = {}
+
+    def _source_line(path: str, line_number: int) -> str | None:
+        if path not in file_cache:
+            try:
+                with open(path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):  # ValueError: empty file
+                file_cache[path] = None
+                return None
+            offsets = [0]
+            pos = mm.find(b"\n")
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = mm.find(b"\n", pos + 1)
+            if offsets[-1] != len(mm):
+                offsets.append(len(mm))
+            file_cache[path] = (mm, offsets)
+
+        entry = file_cache[path]
+        if entry is None:
+            return None
+        mm, offsets = entry
+        if not 0 < line_number < len(offsets):
+            return None
+        raw = mm[offsets[line_number - 1]:offsets[line_number]]
+        return raw.decode("utf-8", errors="replace").strip()
+
     enriched = []
-    file_cache: dict[str, list[str] | None] = {}
     for r in rows:
         ref = {
             "symbol_name": r[0],
@@ -411,37 +599,29 @@ def find_references(symbol_name: str, db, include_context: bool = True) -> list[
             "containing_symbol": None,
         }
 
-        # Get the source line at this reference (cached per file)
+        # Get the source line at this reference (mapped once per file)
         file_path = r[1]
-        if file_path not in file_cache:
-            try:
-                with open(file_path) as f:
-                    file_cache[file_path] = f.readlines()
-            except Exception:
-                file_cache[file_path] = None
-
-        cached_lines = file_cache[file_path]
-        if cached_lines and 0 < r[2] <= len(cached_lines):
-            ref["source_line"] = cached_lines[r[2] - 1].strip()
-
-        # Find containing symbol
-        containing = db.execute(
-            """
-            SELECT s.name, s.kind
-            FROM symbols s
-            JOIN files f ON f.id = s.file_id
-            WHERE f.path = ?
-            AND s.line_start <= ? AND s.line_end >= ?
-            ORDER BY (s.line_end - s.line_start)
-            LIMIT 1
-            """,
-            (r[1], r[2], r[2]),
-        ).fetchone()
+        ref["source_line"] = _source_line(file_path, r[2])
+
+        # Find the tightest symbol span containing this line
+        line_number = r[2]
+        containing = min(
+            (
+                sym for sym in symbols_by_path.get(file_path, ())
+                if sym[2] <= line_number <= sym[3]
+            ),
+            key=lambda sym: sym[3] - sym[2],
+            default=None,
+        )
         if containing:
             ref["containing_symbol"] = {"name": containing[0], "kind": containing[1]}
 
         enriched.append(ref)
 
+    for entry in file_cache.values():
+        if entry is not None:
+            entry[0].close()
+
     return enriched
 
 
@@ -456,9 +636,9 @@ def get_file_structure(file_path: str, db) -> list[dict]:
         A list of dicts with ``name``, ``kind``, ``line_start``, ``line_end``,
         ``parent``.
     """
-    import os
-
-    abs_path = os.path.abspath(file_path)
+    # Indexed files always carry absolute paths; skip the getcwd syscall
+    # when the caller already passed one.
+    abs_path = file_path if os.path.isabs(file_path) else os.path.abspath(file_path)
 
     rows = db.execute(
         """
@@ -490,83 +670,86 @@ def get_file_structure(file_path: str, db) -> list[dict]:
 # ---------------------------------------------------------------------------
 
 
-def _doc_bm25_search(query: str, db, top_k: int = 50) -> list[dict]:
-    """Run FTS5 BM25 search against ``doc_chunks_fts``.
+# Documentation search runs both legs and the RRF fusion inside one SQL
+# statement, so only the top_k fused rows ever cross the Python/SQLite
+# boundary.  Row shape:
+#   (chunk_id, section_title, content, source_file, doc_type,
+#    line_start, line_end, rrf_score)
+_DOC_RRF_SQL = f"""
+WITH b AS (
+    SELECT rowid AS cid,
+           ROW_NUMBER() OVER (ORDER BY bm25(doc_chunks_fts)) AS r
+    FROM doc_chunks_fts
+    WHERE doc_chunks_fts MATCH :fts_query
+    ORDER BY r
+    LIMIT 50
+),
+v AS (
+    SELECT chunk_id AS cid,
+           ROW_NUMBER() OVER (ORDER BY distance) AS r
+    FROM doc_embeddings
+    WHERE embedding MATCH :query_blob
+    AND   k = 50
+),
+fused AS (
+    SELECT cid, SUM(1.0 / ({_RRF_K} + r)) AS score
+    FROM (SELECT cid, r FROM b UNION ALL SELECT cid, r FROM v)
+    GROUP BY cid
+)
+SELECT dc.id, dc.section_title, dc.content, df.path, df.doc_type,
+       dc.line_start, dc.line_end, fused.score
+FROM fused
+JOIN doc_chunks dc ON dc.id = fused.cid
+JOIN doc_files  df ON df.id = dc.doc_file_id
+ORDER BY fused.score DESC
+LIMIT :top_k
+"""
+
+# Vector-only fallback for queries the FTS5 MATCH parser rejects.
+_DOC_VEC_ONLY_SQL = f"""
+WITH v AS (
+    SELECT chunk_id AS cid,
+           ROW_NUMBER() OVER (ORDER BY distance) AS r
+    FROM doc_embeddings
+    WHERE embedding MATCH :query_blob
+    AND   k = 50
+)
+SELECT dc.id, dc.section_title, dc.content, df.path, df.doc_type,
+       dc.line_start, dc.line_end, 1.0 / ({_RRF_K} + v.r) AS score
+FROM v
+JOIN doc_chunks dc ON dc.id = v.cid
+JOIN doc_files  df ON df.id = dc.doc_file_id
+ORDER BY score DESC
+LIMIT :top_k
+"""
+
+
+def _doc_rrf_search(query: str, db, top_k: int,
+                    query_blob: bytes | None = None) -> list[tuple]:
+    """Run the fused BM25 + vector documentation search in SQLite.
 
-    Returns a ranked list of dicts with chunk metadata and bm25_score.
+    Returns the top_k fused rows (see :data:`_DOC_RRF_SQL` for the shape).
+    FTS5 MATCH can reject operator-only queries; those fall back to the
+    vector-only statement, mirroring how the BM25 leg used to degrade.
     """
+    if query_blob is None:
+        query_blob = _embed_query_blob(query)
     safe_query = val.sanitize_fts_query(query)
+    params = {"fts_query": safe_query, "query_blob": query_blob, "top_k": top_k}
+    rows: list[tuple]
     try:
-        rows = db.execute(
-            """
-            SELECT dc.id, dc.section_title, dc.content, df.path, df.doc_type,
-                   dc.line_start, dc.line_end, bm25(doc_chunks_fts) AS score
-            FROM doc_chunks_fts
-            JOIN doc_chunks dc ON dc.id = doc_chunks_fts.rowid
-            JOIN doc_files   df ON df.id = dc.doc_file_id
-            WHERE doc_chunks_fts MATCH ?
-            ORDER BY score
-            LIMIT ?
-            """,
-            (safe_query, top_k),
-        ).fetchall()
-    except Exception as exc:
+        rows = db.execute(_DOC_RRF_SQL, params).fetchall()
+    except sqlite3.OperationalError as exc:
         logger.warning("BM25 doc search failed for query %r: %s", query, exc)
-        return []
-
-    return [
-        {
-            "chunk_id": r[0],
-            "section_title": r[1],
-            "content": r[2],
-            "source_file": r[3],
-            "doc_type": r[4],
-            "line_start": r[5],
-            "line_end": r[6],
-            "bm25_score": r[7],
-        }
-        for r in rows
-    ]
-
-
-def _doc_vector_search(query: str, db, top_k: int = 50) -> list[dict]:
-    """Run dense vector nearest-neighbour search on doc_embeddings."""
-    query_vec = db_mod.embed_text(query)
-    query_blob = struct.pack(f"{len(query_vec)}f", *query_vec)
-
-    rows = db.execute(
-        """
-        SELECT de.chunk_id, de.distance,
-               dc.section_title, dc.content, df.path, df.doc_type,
-               dc.line_start, dc.line_end
-        FROM doc_embeddings de
-        JOIN doc_chunks dc ON dc.id = de.chunk_id
-        JOIN doc_files   df ON df.id = dc.doc_file_id
-        WHERE de.embedding MATCH ?
-        AND   de.k = ?
-        ORDER BY de.distance
-        """,
-        (query_blob, top_k),
-    ).fetchall()
-
-    return [
-        {
-            "chunk_id": r[0],
-            "vec_distance": r[1],
-            "section_title": r[2],
-            "content": r[3],
-            "source_file": r[4],
-            "doc_type": r[5],
-            "line_start": r[6],
-            "line_end": r[7],
-        }
-        for r in rows
-    ]
+        del params["fts_query"]
+        rows = db.execute(_DOC_VEC_ONLY_SQL, params).fetchall()
+    return rows
 
 
 def search_documentation(query: str, db, top_k: int = 10,
                          include_context: bool = False,
-                         rerank: bool = True) -> list[dict]:
+                         rerank: bool = True,
+                         query_blob: bytes | None = None) -> list[dict]:
     """Perform hybrid search over documentation chunks.
 
     Uses BM25 + vector search with Reciprocal Rank Fusion.
@@ -577,54 +760,35 @@ def search_documentation(query: str, db, top_k: int = 10,
         top_k: Maximum results to return.
         include_context: If True, include adjacent chunks for context.
         rerank: If True (default), apply cross-encoder reranking when available.
+        query_blob: Optional precomputed quantized embedding of *query*.
 
     Returns:
         List of matching chunks with source attribution and RRF scores.
     """
-    bm25_results = _doc_bm25_search(query, db, top_k=50)
-    vec_results = _doc_vector_search(query, db, top_k=50)
-
-    # Build RRF score map keyed by chunk_id
-    scores: dict[int, float] = {}
-    details: dict[int, dict] = {}
-
-    for rank, r in enumerate(bm25_results, start=1):
-        cid = r["chunk_id"]
-        scores[cid] = scores.get(cid, 0.0) + 1.0 / (_RRF_K + rank)
-        details[cid] = {
-            "content": r["content"],
-            "source_file": r["source_file"],
-            "section_title": r["section_title"],
-            "line_start": r["line_start"],
-            "line_end": r["line_end"],
-            "doc_type": r["doc_type"],
-        }
-
-    for rank, r in enumerate(vec_results, start=1):
-        cid = r["chunk_id"]
-        scores[cid] = scores.get(cid, 0.0) + 1.0 / (_RRF_K + rank)
-        if cid not in details:
-            details[cid] = {
-                "content": r["content"],
-                "source_file": r["source_file"],
-                "section_title": r["section_title"],
-                "line_start": r["line_start"],
-                "line_end": r["line_end"],
-                "doc_type": r["doc_type"],
-            }
-
-    # Sort by descending RRF score
-    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+    # Both legs and the RRF fusion run inside SQLite; only the fused top
+    # rows come back.  When reranking is on, over-retrieve 4x so the
+    # cross-encoder has a real pool to reorder before the top_k cut.
+    do_rerank = rerank and db_mod.is_reranking_enabled()
+    fetch_k = top_k * 4 if do_rerank else top_k
+    rows = _doc_rrf_search(query, db, top_k=fetch_k, query_blob=query_blob)
 
     # Normalize scores to 0-100 (same approach as hybrid_search).
-    max_rrf = 2.0 / (_RRF_K + 1)  # theoretical max for hybrid hit
+    max_rrf = _MAX_HYBRID_RRF
     results = [
-        {**details[cid], "score": round(min(100.0, (raw / max_rrf) * 100.0), 1)}
-        for cid, raw in ranked
+        {
+            "content": row[2],
+            "source_file": row[3],
+            "section_title": row[1],
+            "line_start": row[5],
+            "line_end": row[6],
+            "doc_type": row[4],
+            "score": round(min(100.0, (row[7] / max_rrf) * 100.0), 1),
+        }
+        for row in rows
     ]
 
     # Apply cross-encoder reranking for improved precision
-    if rerank and db_mod.is_reranking_enabled():
+    if do_rerank:
         results = db_mod.rerank_results(query, results, top_k=top_k)
 
     # Optionally include adjacent chunks for context
@@ -635,51 +799,46 @@ def search_documentation(query: str, db, top_k: int = 10,
 
 
 def _add_context_chunks(results: list[dict], db) -> list[dict]:
-    """Add adjacent chunks to results for additional context."""
-    enriched = []
+    """Add adjacent chunks to results for additional context.
 
-    for result in results:
-        # Get the chunk's file and index
-        row = db.execute(
-            """
-            SELECT dc.chunk_index, dc.doc_file_id
-            FROM doc_chunks dc
-            JOIN doc_files df ON df.id = dc.doc_file_id
-            WHERE df.path = ? AND dc.line_start = ? AND dc.line_end = ?
-            """,
-            (result["source_file"], result["line_start"], result["line_end"]),
-        ).fetchone()
+    A single ``json_each``-driven self-join resolves every result's chunk
+    and fetches its previous and next neighbours, replacing three SQLite
+    round-trips per result with one per batch.
+    """
+    spec = json.dumps(
+        [[r["source_file"], r["line_start"], r["line_end"]] for r in results]
+    )
+    rows = db.execute(
+        """
+        SELECT q.key, prev.content, nxt.content
+        FROM json_each(?) q
+        JOIN doc_files df ON df.path = q.value ->> 0
+        JOIN doc_chunks dc ON dc.doc_file_id = df.id
+            AND dc.line_start = q.value ->> 1
+            AND dc.line_end   = q.value ->> 2
+        LEFT JOIN doc_chunks prev ON prev.doc_file_id = dc.doc_file_id
+            AND prev.chunk_index = dc.chunk_index - 1
+        LEFT JOIN doc_chunks nxt  ON nxt.doc_file_id = dc.doc_file_id
+            AND nxt.chunk_index = dc.chunk_index + 1
+        """,
+        (spec,),
+    ).fetchall()
+    neighbours = {row[0]: (row[1], row[2]) for row in rows}
 
-        if not row:
+    enriched = []
+    for i, result in enumerate(results):
+        found = neighbours.get(i)
+        if found is None:
             enriched.append(result)
             continue
 
-        chunk_index, doc_file_id = row
-
-        # Get previous and next chunks
+        prev_content, next_content = found
         context_parts = []
-
-        prev = db.execute(
-            """
-            SELECT content FROM doc_chunks
-            WHERE doc_file_id = ? AND chunk_index = ?
-            """,
-            (doc_file_id, chunk_index - 1),
-        ).fetchone()
-        if prev:
-            context_parts.append({"type": "previous", "content": prev[0][:200]})
-
+        if prev_content:
+            context_parts.append({"type": "previous", "content": prev_content[:200]})
         context_parts.append({"type": "current", "content": result["content"]})
-
-        next_chunk = db.execute(
-            """
-            SELECT content FROM doc_chunks
-            WHERE doc_file_id = ? AND chunk_index = ?
-            """,
-            (doc_file_id, chunk_index + 1),
-        ).fetchone()
-        if next_chunk:
-            context_parts.append({"type": "next", "content": next_chunk[0][:200]})
+        if next_content:
+            context_parts.append({"type": "next", "content": next_content[:200]})
 
         enriched.append({
             **result,
@@ -726,69 +885,62 @@ def discover_topic(topic_query: str, db, top_k: int = 15, include_snippets: bool
         - summary: Brief description of what in this file is relevant
         - top_snippets: Code snippets from top-matching symbols (if include_snippets)
     """
-    # Search code symbols only (documentation is handled by search_docs)
-    code_results = hybrid_search(topic_query, db, top_k=50, rerank=rerank)
-
-    # Aggregate by file path, collecting all matched items
-    file_aggregates: dict[str, dict] = {}
+    # Search code symbols only (documentation is handled by search_docs).
+    # Embed once here so the blob is shared with any follow-up searches.
+    query_blob = _embed_query_blob(topic_query)
+    code_results = hybrid_search(topic_query, db, top_k=50, rerank=rerank,
+                                 query_blob=query_blob)
+
+    # Aggregate by file path, collecting all matched items.  Accumulators
+    # are positional [score, names, kinds, details] lists — the result-dict
+    # shape is only materialized for the top_k files that survive below.
+    file_aggregates: dict[str, list] = collections.defaultdict(
+        lambda: [0.0, [], set(), []]
+    )
 
     for r in code_results:
         fp = r.get("file_path", "")
         if not fp:
             continue
-        if fp not in file_aggregates:
-            file_aggregates[fp] = {
-                "file_path": fp,
-                "relevance_score": 0.0,
-                "matched_symbols": [],
-                "symbol_kinds": set(),
-                "symbol_details": [],  # Store full details for snippets
-            }
-        file_aggregates[fp]["relevance_score"] += r.get("score", 0.0)
-        file_aggregates[fp]["matched_symbols"].append(r.get("name", ""))
-        file_aggregates[fp]["symbol_kinds"].add(r.get("kind", ""))
-        file_aggregates[fp]["symbol_details"].append({
-            "name": r.get("name"),
-            "kind": r.get("kind"),
-            "line_start": r.get("line_start"),
-            "line_end": r.get("line_end"),
-            "source_text": r.get("source_text"),
-            "score": r.get("score"),
-        })
-
-    # Sort by relevance and take top_k
-    sorted_files = sorted(
-        file_aggregates.values(),
-        key=lambda x: x["relevance_score"],
-        reverse=True
-    )[:top_k]
+        agg = file_aggregates[fp]
+        agg[0] += r.get("score", 0.0)
+        agg[1].append(r.get("name", ""))
+        agg[2].add(r.get("kind", ""))
+        agg[3].append(r)  # Full result row, for snippets
+
+    # Top-k files by relevance
+    sorted_files = heapq.nlargest(
+        top_k,
+        file_aggregates.items(),
+        key=lambda kv: kv[1][0],
+    )
 
     # Build final results with summaries
     results = []
-    for item in sorted_files:
+    for fp, (relevance, matched_symbols, symbol_kinds, symbol_details) in sorted_files:
         # Generate a summary of what matched
-        symbol_summary = ", ".join(item["matched_symbols"][:5])
-        if len(item["matched_symbols"]) > 5:
-            symbol_summary += f" (+{len(item['matched_symbols']) - 5} more)"
+        symbol_summary = ", ".join(matched_symbols[:5])
+        if len(matched_symbols) > 5:
+            symbol_summary += f" (+{len(matched_symbols) - 5} more)"
 
-        kinds = ", ".join(k for k in item["symbol_kinds"] if k)
+        kinds = ", ".join(k for k in symbol_kinds if k)
 
         result = {
-            "file_path": item["file_path"],
-            "relevance_score": round(item["relevance_score"], 4),
-            "matched_symbols": item["matched_symbols"][:10],
+            "file_path": fp,
+            "relevance_score": round(relevance, 4),
+            "matched_symbols": matched_symbols[:10],
             "symbol_kinds": kinds,
             "summary": f"Contains {kinds}: {symbol_summary}" if kinds else f"Related symbols: {symbol_summary}",
         }
 
         # Add top snippets if requested
-        if include_snippets and item["symbol_details"]:
+        if include_snippets and symbol_details:
             # Sort by score and take top 2
-            top_symbols = sorted(
-                item["symbol_details"],
+            top_symbols = heapq.nlargest(
+                2,
+                symbol_details,
                 key=lambda x: x.get("score", 0) or 0,
-                reverse=True
-            )[:2]
+            )
             result["top_snippets"] = [
                 {
                     "name": s["name"],
@@ -847,8 +999,6 @@ _REEXPORT_FILENAMES: frozenset[str] = frozenset({
 
 def _is_test_path(path: str) -> bool:
     """Return True if *path* looks like a test or fixture file."""
-    import os
-
     norm = path.replace("\\", "/").lower()
     basename = os.path.basename(norm)
 
@@ -934,8 +1084,6 @@ def _score_dead_code_candidate(
     dynamic dispatch, reflection, and string-based imports can always hide
     usages.  ``reasons`` is an ordered list of human-readable explanations.
     """
-    import os
-
     reasons: list[str] = ["No references found outside this symbol's own definition"]
     confidence = 0.6
 
@@ -1040,8 +1188,6 @@ def find_dead_code(
     registration.  Treat results as candidates to investigate, not as a
     definitive deletion list.
     """
-    import os
-
     requested_kinds = list(kinds) if kinds is not None else list(_DEAD_CODE_DEFAULT_KINDS)
     if not requested_kinds:
         return {
@@ -14,6 +14,9 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import contextlib
+import functools
+from collections.abc import Callable
 from typing import Any, Literal, cast
 
 from mcp.server.fastmcp import Context, FastMCP
@@ -37,11 +40,35 @@ _HINT_DOCS_NOT_INDEXED = (
 )
 
 
+@functools.cache
+def _git_modules():
+    """Load the git-history modules once, on the first search_history call.
+
+    Keeps GitPython off the server's import path until a history tool is
+    actually used, while later calls skip the per-call import statements.
+    Returns the search module and the not-a-repository exception types as
+    a tuple usable directly in an ``except`` clause.
+    """
+    from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+    from . import git_search as gs
+    return gs, (InvalidGitRepositoryError, NoSuchPathError)
+
+
+def _ok(**fields: Any) -> dict[str, Any]:
+    """Assemble a success response: ``{"status": "ok"}`` plus *fields*.
+
+    One place owns the outer response shell instead of each tool branch
+    restating it.
+    """
+    return {"status": "ok", **fields}
+
+
 def _hint_if_unindexed(
     response: Any, db: Any, *, table: Literal["symbols", "doc_chunks"], hint: str
 ) -> None:
     """Attach `hint` to `response` if the given table has zero rows."""
-    if db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0:
+    if db_mod.table_is_empty(db, table):
         response["hint"] = hint
 
 
@@ -138,15 +165,10 @@ def check_index_status(directory: str) -> api_types.CheckIndexStatusResponse | a
     try:
         database = db_mod.get_db(directory)
 
-        # Count symbols
-        symbols_count = database.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
-
-        # Count doc chunks
-        doc_chunks_count = database.execute("SELECT COUNT(*) FROM doc_chunks").fetchone()[0]
-
-        # Count files
-        files_count = database.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-        doc_files_count = database.execute("SELECT COUNT(*) FROM doc_files").fetchone()[0]
+        # All four counts in one statement — one round-trip instead of four
+        symbols_count, doc_chunks_count, files_count, doc_files_count = (
+            db_mod.index_counts(database)
+        )
 
         indexed = symbols_count > 0 or doc_chunks_count > 0
 
@@ -202,12 +224,23 @@ def get_index_stats(directory: str) -> api_types.GetIndexStatsResponse | api_typ
         try:
             database = db_mod.get_db(directory)
             stats = db_mod.get_index_stats(database, directory)
-            return cast(api_types.GetIndexStatsResponse, {"status": "ok", **stats})
+            return cast(api_types.GetIndexStatsResponse, _ok(**stats))
         except Exception as e:
             return errors.format_error(e)
 
 
 # ── Tool 1: search_code ───────────────────────────────────────────────────
+
+# Handler per search_type; every handler takes (query, database) and returns
+# the results list for the shared response scaffolding in search_code.
+_CODE_SEARCH_HANDLERS: dict[str, Callable[[str, Any], list[dict]]] = {
+    "topic_discovery": queries.discover_topic,
+    "definition": queries.find_definition,
+    "references": queries.find_references,
+    "file_structure": queries.get_file_structure,
+}
+
+
 @mcp.tool()
 def search_code(
     query: str,
@@ -302,67 +335,29 @@ def search_code(
     """
     with logging_config.ToolLogger("search_code", query=query, search_type=search_type) as log:
         try:
-            # Validate inputs
+            # Validate inputs.  search_type is already schema-checked at the
+            # MCP boundary (the Literal becomes a JSON-schema enum); the
+            # handler lookup below covers direct callers without a separate
+            # validation pass.
             query = val.validate_query(query)
-            validated_search_type = val.validate_search_type(
-                search_type, ["topic_discovery", "definition", "references", "file_structure"]
-            )
+            handler = _CODE_SEARCH_HANDLERS.get(search_type)
+            if handler is None:
+                raise errors.ValidationError(f"Unknown search_type: {search_type}")
 
             database = db_mod.get_db(directory)
 
-            if validated_search_type == "topic_discovery":
-                results = queries.discover_topic(query, database)
-                log.set_result_count(len(results))
-                topic_response = cast(api_types.SearchCodeTopicDiscoveryResponse, {
-                    "status": "ok",
-                    "search_type": "topic_discovery",
-                    "query": query,
-                    "results": results,
-                })
-                if not results:
-                    _hint_if_unindexed(topic_response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
-                return topic_response
-
-            elif validated_search_type == "definition":
-                results = queries.find_definition(query, database)
-                log.set_result_count(len(results))
-                def_response = cast(api_types.SearchCodeDefinitionResponse, {
-                    "status": "ok",
-                    "search_type": "definition",
-                    "query": query,
-                    "results": results,
-                })
-                if not results:
-                    _hint_if_unindexed(def_response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
-                return def_response
-
-            elif validated_search_type == "references":
-                results = queries.find_references(query, database)
-                log.set_result_count(len(results))
-                ref_response = cast(api_types.SearchCodeReferencesResponse, {
-                    "status": "ok",
-                    "search_type": "references",
-                    "query": query,
-                    "results": results,
-                })
-                if not results:
-                    _hint_if_unindexed(ref_response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
-                return ref_response
-
-            elif validated_search_type == "file_structure":
-                results = queries.get_file_structure(query, database)
-                log.set_result_count(len(results))
-                struct_response = cast(api_types.SearchCodeFileStructureResponse, {
-                    "status": "ok",
-                    "search_type": "file_structure",
-                    "query": query,
-                    "results": results,
-                })
-                if not results:
-                    _hint_if_unindexed(struct_response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
-                return struct_response
-
-            return errors.format_error(errors.ValidationError(f"Unknown search_type: {search_type}"))
+            # All four search types share the same response scaffolding;
+            # dispatch through the handler table instead of an if/elif chain
+            results = handler(query, database)
+            log.set_result_count(len(results))
+            response = cast(api_types.SearchCodeResponse, _ok(
+                search_type=search_type,
+                query=query,
+                results=results,
+            ))
+            if not results:
+                _hint_if_unindexed(response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
+            return response
 
         except errors.CodeMemoryError as e:
             return e.to_dict()
@@ -372,7 +367,7 @@ def search_code(
 
 # ── Tool 2: index_codebase ────────────────────────────────────────────────
 @mcp.tool()
-async def index_codebase(directory: str, ctx: Context, cpu: bool = False) -> api_types.IndexCodebaseResponse | api_types.ErrorResponse:
+async def index_codebase(directory: str, ctx: Context, cpu: bool = False, verbose: bool = False) -> api_types.IndexCodebaseResponse | api_types.ErrorResponse:
     """YOU MUST CALL THIS TOOL FIRST before using search_code or search_docs. Use this tool to build the searchable index that powers all other code intelligence features.
 
     TRIGGER: Call this tool immediately when:
@@ -403,9 +398,14 @@ async def index_codebase(directory: str, ctx: Context, cpu: bool = False) -> api
              Use this when GPU memory is unavailable or constrained (CUDA OOM).
              Default is False (auto-detect best device: CUDA > MPS > CPU).
              Set CODE_MEMORY_DEVICE env var to override ('cuda', 'mps', 'cpu', or 'auto').
+        verbose: If True, include a per-file "details" breakdown in the
+                 response. Off by default — on large repos those lists
+                 dominate the response size while the summary counters
+                 already tell the whole story.
 
     Returns:
-        Summary with files_indexed, total_symbols, total_chunks, and details.
+        Summary with files_indexed, total_symbols, total_chunks, and
+        (when verbose) per-file details.
     """
     import time
 
@@ -454,67 +454,97 @@ async def index_codebase(directory: str, ctx: Context, cpu: bool = False) -> api
                     loop
                 )
 
-            # Index code files in a thread to allow progress reporting
-            code_logger = logging_config.IndexingLogger("code")
-            code_logger.start(str(directory_path))
-
-            await ctx.report_progress(0, 100, "Phase 1/3: Scanning code files...")
-
-            code_results = await asyncio.to_thread(
-                parser_mod.index_directory,
-                str(directory_path),
-                database,
-                sync_progress_callback
-            )
-
-            for r in code_results:
-                if r.get("skipped"):
-                    code_logger.file_skipped(r.get("file", "unknown"), r.get("reason", "unknown"))
-                else:
-                    code_logger.file_indexed(r.get("file", "unknown"), r.get("symbols_indexed", 0))
-            code_logger.complete()
-
-            indexed = [r for r in code_results if not r.get("skipped")]
-            skipped = [r for r in code_results if r.get("skipped")]
-
-            # Index documentation files
-            doc_logger = logging_config.IndexingLogger("documentation")
-            doc_logger.start(str(directory_path))
-
-            # Calculate progress offset for doc indexing
-            code_file_count = len(code_results)
-            doc_progress_offset = code_file_count
-
-            await ctx.report_progress(code_file_count, code_file_count, "Phase 2/3: Scanning documentation files...")
-
-            doc_results = await asyncio.to_thread(
-                doc_parser_mod.index_doc_directory,
-                str(directory_path),
-                database,
-                sync_progress_callback,
-                doc_progress_offset,
-                code_file_count  # Will be updated by callback
+            # First-time loads run in bulk mode: the FTS sync triggers are
+            # dropped for the duration and both FTS tables are rebuilt once at
+            # the end, avoiding per-row trigger fan-out.  Incremental runs keep
+            # the triggers live, since a rebuild re-reads every existing row —
+            # unless a previous bulk load died mid-run, in which case rows are
+            # missing from FTS and only a rebuild can heal them.
+            fresh_index = (
+                db_mod.table_is_empty(database, "symbols")
+                and db_mod.table_is_empty(database, "doc_chunks")
             )
+            use_bulk = fresh_index or db_mod.fts_rebuild_pending(database)
+            bulk_ctx = db_mod.bulk_mode(database) if use_bulk else contextlib.nullcontext()
+            with bulk_ctx:
+                # Index code files in a thread to allow progress reporting
+                code_logger = logging_config.IndexingLogger("code")
+                code_logger.start(str(directory_path))
+
+                await ctx.report_progress(0, 100, "Phase 1/3: Scanning code files...")
+
+                code_results = await asyncio.to_thread(
+                    parser_mod.index_directory,
+                    str(directory_path),
+                    database,
+                    sync_progress_callback
+                )
 
-            for r in doc_results:
-                if r.get("skipped"):
-                    doc_logger.file_skipped(r.get("file", "unknown"), r.get("reason", "unknown"))
-                else:
-                    doc_logger.file_indexed(r.get("file", "unknown"), r.get("chunks_indexed", 0))
-            doc_logger.complete()
+                # Aggregate in the same pass as the per-file logging; the
+                # per-file dicts are only retained for a verbose response
+                indexed: list[dict] = []
+                code_indexed_count = 0
+                code_skipped_count = 0
+                total_symbols = 0
+                total_references = 0
+                for r in code_results:
+                    if r.get("skipped"):
+                        code_skipped_count += 1
+                        code_logger.file_skipped(r.get("file", "unknown"), r.get("reason", "unknown"))
+                    else:
+                        if verbose:
+                            indexed.append(r)
+                        code_indexed_count += 1
+                        total_symbols += r.get("symbols_indexed", 0)
+                        total_references += r.get("references_indexed", 0)
+                        code_logger.file_indexed(r.get("file", "unknown"), r.get("symbols_indexed", 0))
+                code_logger.complete()
+
+                # Index documentation files
+                doc_logger = logging_config.IndexingLogger("documentation")
+                doc_logger.start(str(directory_path))
+
+                # Calculate progress offset for doc indexing
+                code_file_count = len(code_results)
+                doc_progress_offset = code_file_count
+
+                await ctx.report_progress(code_file_count, code_file_count, "Phase 2/3: Scanning documentation files...")
+
+                doc_results = await asyncio.to_thread(
+                    doc_parser_mod.index_doc_directory,
+                    str(directory_path),
+                    database,
+                    sync_progress_callback,
+                    doc_progress_offset,
+                    code_file_count  # Will be updated by callback
+                )
 
-            doc_indexed = [r for r in doc_results if not r.get("skipped")]
-            doc_skipped = [r for r in doc_results if r.get("skipped")]
+                doc_indexed: list[dict] = []
+                doc_indexed_count = 0
+                doc_skipped_count = 0
+                total_chunks = 0
+                for r in doc_results:
+                    if r.get("skipped"):
+                        doc_skipped_count += 1
+                        doc_logger.file_skipped(r.get("file", "unknown"), r.get("reason", "unknown"))
+                    else:
+                        if verbose:
+                            doc_indexed.append(r)
+                        doc_indexed_count += 1
+                        total_chunks += r.get("chunks_indexed", 0)
+                        doc_logger.file_indexed(r.get("file", "unknown"), r.get("chunks_indexed", 0))
+                doc_logger.complete()
+
+                # Extract docstrings from indexed code
+                await ctx.report_progress(0, 0, "Phase 3/3: Extracting docstrings...")
+                docstring_results = await asyncio.to_thread(
+                    doc_parser_mod.extract_docstrings_from_code,
+                    database
+                )
 
-            # Extract docstrings from indexed code
-            await ctx.report_progress(0, 0, "Phase 3/3: Extracting docstrings...")
-            docstring_results = await asyncio.to_thread(
-                doc_parser_mod.extract_docstrings_from_code,
-                database
-            )
+            # The index just changed shape; drop memoized status counts
+            db_mod.invalidate_counts()
 
-            total_symbols = sum(r.get("symbols_indexed", 0) for r in indexed)
-            total_chunks = sum(r.get("chunks_indexed", 0) for r in doc_indexed)
             log.set_result_count(total_symbols + total_chunks + len(docstring_results))
 
             # Calculate final throughput
@@ -528,33 +558,31 @@ async def index_codebase(directory: str, ctx: Context, cpu: bool = False) -> api
             total_code_files = database.execute("SELECT COUNT(*) FROM files").fetchone()[0]
             total_doc_files = database.execute("SELECT COUNT(*) FROM doc_files").fetchone()[0]
 
-            return cast(api_types.IndexCodebaseResponse, {
-                "status": "ok",
-                "directory": str(directory_path),
-                "performance": {
+            response = _ok(
+                directory=str(directory_path),
+                performance={
                     "total_time_seconds": round(total_elapsed, 2),
                     "files_per_second": round(files_per_sec, 1),
                     "total_files_processed": total_files,
                 },
-                "code": {
-                    "files_newly_indexed": len(indexed),
-                    "files_unchanged": len(skipped),
+                code={
+                    "files_newly_indexed": code_indexed_count,
+                    "files_unchanged": code_skipped_count,
                     "total_indexed_files": total_code_files,
                     "total_symbols": total_symbols,
-                    "total_references": sum(r.get("references_indexed", 0) for r in indexed),
+                    "total_references": total_references,
                 },
-                "documentation": {
-                    "files_newly_indexed": len(doc_indexed),
-                    "files_unchanged": len(doc_skipped),
+                documentation={
+                    "files_newly_indexed": doc_indexed_count,
+                    "files_unchanged": doc_skipped_count,
                     "total_indexed_files": total_doc_files,
                     "total_chunks": total_chunks,
                     "docstrings_extracted": len(docstring_results),
                 },
-                "details": {
-                    "code": indexed,
-                    "docs": doc_indexed,
-                },
-            })
+            )
+            if verbose:
+                response["details"] = {"code": indexed, "docs": doc_indexed}
+            return cast(api_types.IndexCodebaseResponse, response)
 
         except errors.CodeMemoryError as e:
             return e.to_dict()
@@ -625,12 +653,11 @@ def search_docs(query: str, directory: str, top_k: int = 10) -> api_types.Search
                 for r in results
             ]
 
-            response = cast(api_types.SearchDocsResponse, {
-                "status": "ok",
-                "query": query,
-                "results": formatted_results,
-                "count": len(formatted_results),
-            })
+            response = cast(api_types.SearchDocsResponse, _ok(
+                query=query,
+                results=formatted_results,
+                count=len(formatted_results),
+            ))
 
             if not results:
                 _hint_if_unindexed(response, database, table="doc_chunks", hint=_HINT_DOCS_NOT_INDEXED)
@@ -709,66 +736,59 @@ def search_history(
     with logging_config.ToolLogger("search_history", query=query, search_type=search_type,
                                    target_file=target_file) as log:
         try:
-            from git.exc import InvalidGitRepositoryError, NoSuchPathError
-
-            from . import git_search as gs
+            gs, git_not_a_repo_errors = _git_modules()
 
-            # Validate inputs
-            validated_search_type = val.validate_search_type(
-                search_type, ["commits", "file_history", "blame", "commit_detail"]
-            )
+            # Validate inputs.  search_type is schema-checked at the MCP
+            # boundary; the guard covers direct callers before any repo
+            # access, mirroring search_code's handler lookup.
+            if search_type not in ("commits", "file_history", "blame", "commit_detail"):
+                raise errors.ValidationError(f"Unknown search_type: {search_type}")
             line_start, line_end = val.validate_line_range(line_start, line_end)
 
             # Get git repository
             try:
                 repo = gs.get_repo(directory)
-            except (InvalidGitRepositoryError, NoSuchPathError) as exc:
+            except git_not_a_repo_errors as exc:
                 raise errors.GitError(f"Git repository not found: {exc}")
 
-            if validated_search_type == "commits":
+            if search_type == "commits":
                 query = val.validate_query(query, min_length=1)
                 results = gs.search_commits(repo, query, target_file)
                 log.set_result_count(len(results))
-                return cast(api_types.SearchHistoryCommitsResponse, {
-                    "status": "ok",
-                    "search_type": "commits",
-                    "query": query,
-                    "results": results,
-                })
-
-            elif validated_search_type == "file_history":
+                return cast(api_types.SearchHistoryCommitsResponse, _ok(
+                    search_type="commits",
+                    query=query,
+                    results=results,
+                ))
+
+            elif search_type == "file_history":
                 if not target_file:
                     raise errors.ValidationError("target_file is required for file_history search")
                 results = gs.get_file_history(repo, target_file)
                 log.set_result_count(len(results))
-                return cast(api_types.SearchHistoryFileHistoryResponse, {
-                    "status": "ok",
-                    "search_type": "file_history",
-                    "target_file": target_file,
-                    "results": results,
-                })
-
-            elif validated_search_type == "blame":
+                return cast(api_types.SearchHistoryFileHistoryResponse, _ok(
+                    search_type="file_history",
+                    target_file=target_file,
+                    results=results,
+                ))
+
+            elif search_type == "blame":
                 if not target_file:
                     raise errors.ValidationError("target_file is required for blame search")
                 results = gs.get_blame(repo, target_file, line_start, line_end)
                 log.set_result_count(len(results))
-                return cast(api_types.SearchHistoryBlameResponse, {
-                    "status": "ok",
-                    "search_type": "blame",
-                    "target_file": target_file,
-                    "results": results,
-                })
-
-            elif validated_search_type == "commit_detail":
-                result = gs.get_commit_detail(repo, query, target_file)
-                return cast(api_types.SearchHistoryCommitDetailResponse, {
-                    "status": "ok",
-                    "search_type": "commit_detail",
-                    "result": result,
-                })
+                return cast(api_types.SearchHistoryBlameResponse, _ok(
+                    search_type="blame",
+                    target_file=target_file,
+                    results=results,
+                ))
 
-            return errors.format_error(errors.ValidationError(f"Unknown search_type: {search_type}"))
+            else:  # commit_detail — only type left after the guard above
+                result = gs.get_commit_detail(repo, query, target_file)
+                return cast(api_types.SearchHistoryCommitDetailResponse, _ok(
+                    search_type="commit_detail",
+                    result=result,
+                ))
 
         except errors.CodeMemoryError as e:
             return e.to_dict()
@@ -901,15 +921,14 @@ def find_dead_code(
             )
             log.set_result_count(len(result["candidates"]))
 
-            response = cast(api_types.FindDeadCodeResponse, {
-                "status": "ok",
-                "directory": str(directory_path),
-                "candidates": result["candidates"],
-                "count": len(result["candidates"]),
-                "scanned_symbols": result["scanned_symbols"],
-                "total_symbols": result["total_symbols"],
-                "limitations": result["limitations"],
-            })
+            response = cast(api_types.FindDeadCodeResponse, _ok(
+                directory=str(directory_path),
+                candidates=result["candidates"],
+                count=len(result["candidates"]),
+                scanned_symbols=result["scanned_symbols"],
+                total_symbols=result["total_symbols"],
+                limitations=result["limitations"],
+            ))
 
             if result["total_symbols"] == 0:
                 _hint_if_unindexed(response, database, table="symbols", hint=_HINT_CODE_NOT_INDEXED)
@@ -0,0 +1,120 @@
+"""Tests for db-layer index maintenance (invalidation, bulk loads)."""
+
+import sqlite3
+from unittest.mock import patch
+
+from code_memory import db as db_mod
+
+
+def _schema_only_conn(temp_dir) -> sqlite3.Connection:
+    """Open a database with the base schema but no sqlite-vec tables.
+
+    The maintenance paths under test never read the embedding tables, so
+    the extension is not needed.
+    """
+    conn = sqlite3.connect(temp_dir / "code_memory.db")
+    conn.executescript(db_mod._SCHEMA_SQL)
+    return conn
+
+
+class TestInvalidateIndex:
+    def test_tree_signatures_are_cleared(self, temp_dir):
+        """Invalidation must not leave signatures that vouch for deleted rows.
+
+        A surviving ``tree_signature:`` key would make the next index run
+        skip its re-scan against the freshly emptied tables.
+        """
+        conn = _schema_only_conn(temp_dir)
+        conn.executemany(
+            "INSERT INTO index_metadata (key, value) VALUES (?, ?)",
+            [
+                ("tree_signature:/repo", "abc123"),
+                ("tree_signature:/other", "def456"),
+                ("embedding_model", "some-model"),
+            ],
+        )
+        conn.commit()
+
+        # Embedding-table recreation needs sqlite-vec, which is orthogonal
+        # to the metadata cleanup under test.
+        with patch.object(db_mod, "_create_embedding_tables"):
+            db_mod._invalidate_index(conn, 8)
+
+        keys = [r[0] for r in conn.execute("SELECT key FROM index_metadata")]
+        assert not any(k.startswith("tree_signature:") for k in keys)
+        # Model metadata is managed by the caller, not wiped here
+        assert "embedding_model" in keys
+
+
+class TestBulkModeCrashRecovery:
+    def _simulate_death_mid_bulk(self, conn) -> None:
+        """Leave the database as a process killed inside bulk_mode() would.
+
+        Replays the entry steps of the context manager (marker recorded,
+        triggers dropped), commits rows into both content tables, and never
+        reaches the rebuild.
+        """
+        conn.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) "
+            "VALUES ('bulk_in_progress', '1')"
+        )
+        for name in db_mod._FTS_TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(
+            "INSERT INTO files (path, last_modified, file_hash) "
+            "VALUES ('/src.py', 0.0, 'h')"
+        )
+        conn.execute(
+            "INSERT INTO symbols (name, kind, file_id, line_start, line_end, "
+            "parent_symbol_id, source_text) "
+            "VALUES ('orphaned_func', 'function', 1, 1, 2, NULL, "
+            "'def orphaned_func(): pass')"
+        )
+        conn.execute(
+            "INSERT INTO doc_files (path, last_modified, file_hash, doc_type) "
+            "VALUES ('/README.md', 0.0, 'h', 'readme')"
+        )
+        conn.execute(
+            "INSERT INTO doc_chunks (doc_file_id, chunk_index, section_title, "
+            "content, line_start, line_end) "
+            "VALUES (1, 0, 'Intro', 'orphaned chunk text', 1, 2)"
+        )
+        conn.commit()
+
+    def test_interrupted_bulk_load_is_healed_by_next_run(self, temp_dir):
+        conn = _schema_only_conn(temp_dir)
+        self._simulate_death_mid_bulk(conn)
+
+        # The committed rows never fanned out to FTS, and the marker says so
+        assert conn.execute(
+            "SELECT COUNT(*) FROM symbols_fts WHERE symbols_fts MATCH 'orphaned_func'"
+        ).fetchone()[0] == 0
+        assert conn.execute(
+            "SELECT COUNT(*) FROM doc_chunks_fts WHERE doc_chunks_fts MATCH 'orphaned'"
+        ).fetchone()[0] == 0
+        assert db_mod.fts_rebuild_pending(conn)
+
+        # index_codebase sees the marker and re-enters bulk mode; exiting
+        # rebuilds both FTS tables, re-creates the triggers and clears it
+        with db_mod.bulk_mode(conn):
+            pass
+
+        assert not db_mod.fts_rebuild_pending(conn)
+        assert conn.execute(
+            "SELECT COUNT(*) FROM symbols_fts WHERE symbols_fts MATCH 'orphaned_func'"
+        ).fetchone()[0] == 1
+        assert conn.execute(
+            "SELECT COUNT(*) FROM doc_chunks_fts WHERE doc_chunks_fts MATCH 'orphaned'"
+        ).fetchone()[0] == 1
+
+        # Triggers are live again: a plain insert syncs without a rebuild
+        conn.execute(
+            "INSERT INTO symbols (name, kind, file_id, line_start, line_end, "
+            "parent_symbol_id, source_text) "
+            "VALUES ('later_func', 'function', 1, 3, 4, NULL, "
+            "'def later_func(): pass')"
+        )
+        conn.commit()
+        assert conn.execute(
+            "SELECT COUNT(*) FROM symbols_fts WHERE symbols_fts MATCH 'later_func'"
+        ).fetchone()[0] == 1
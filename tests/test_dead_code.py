@@ -637,6 +637,10 @@ def prepopulated_directory(temp_dir):
         "INSERT INTO index_metadata (key, value) VALUES ('embedding_dim', ?)",
         ("8",),
     )
+    conn.execute(
+        "INSERT INTO index_metadata (key, value) VALUES ('embedding_dtype', ?)",
+        (db_mod.EMBEDDING_DTYPE,),
+    )
     conn.commit()
     yield temp_dir, conn
     conn.close()
@@ -0,0 +1,131 @@
+"""Tests for the tree-sitter parser/indexer."""
+
+import sqlite3
+from unittest.mock import patch
+
+from code_memory import db as db_mod
+from code_memory import parser as parser_mod
+
+
+def _write_big_python_file(path, min_bytes: int) -> str:
+    """Write a syntactically valid .py file larger than *min_bytes*."""
+    chunks = []
+    i = 0
+    size = 0
+    while size <= min_bytes:
+        chunk = f"def func_{i}(value):\n    return value + {i}\n\n"
+        chunks.append(chunk)
+        size += len(chunk)
+        i += 1
+    content = "".join(chunks)
+    path.write_text(content)
+    return content
+
+
+class TestParseLargeFiles:
+    """Files above ``_MMAP_THRESHOLD`` are memory-mapped rather than read
+    into bytes; parsing must stick to the API surface mmap actually has
+    (``find``/``rfind`` but no ``count``)."""
+
+    def test_parse_file_above_mmap_threshold(self, tmp_path):
+        src = tmp_path / "big.py"
+        _write_big_python_file(src, parser_mod._MMAP_THRESHOLD)
+        assert src.stat().st_size > parser_mod._MMAP_THRESHOLD
+
+        parsed = parser_mod._parse_file_for_indexing(
+            str(src), db=None, existing_meta={}
+        )
+
+        assert parsed is not None
+        assert not parsed["skipped"]
+        assert not parsed["fallback"]
+        assert parsed["symbols"]
+        # The minified-output density check ran over the mapped buffer and
+        # correctly kept reference extraction enabled for normal code
+        assert parsed["references"]
+
+    def test_incremental_reparse_of_file_grown_past_threshold(self, tmp_path):
+        """A cached tree must survive the file crossing into mmap territory.
+
+        The first parse caches (hash, source, tree); the second parse takes
+        the tree.edit() path with the new content arriving as an mmap, so
+        the edit points are computed against a mapped buffer.
+        """
+        src = tmp_path / "grown.py"
+        src.write_text("def seed(value):\n    return value\n\n")
+        small = parser_mod._parse_file_for_indexing(
+            str(src), db=None, existing_meta={}
+        )
+        assert small is not None and small["symbols"]
+
+        content = _write_big_python_file(src, parser_mod._MMAP_THRESHOLD)
+
+        parsed = parser_mod._parse_file_for_indexing(
+            str(src), db=None, existing_meta={}
+        )
+
+        assert parsed is not None
+        assert not parsed["skipped"]
+        # Symbol set matches the rewritten content, not the seed
+        names = {sym.name for sym in parsed["symbols"]}
+        assert "func_0" in names
+        assert "seed" not in names
+
+        # The incrementally re-parsed tree must agree with a fresh full parse
+        full_tree = parser_mod._get_parser(".py").parse(content.encode())
+        full_symbols = parser_mod._extract_symbols(
+            full_tree.root_node, content.encode(), parser_mod._kind_map_for(".py")
+        )
+        assert (
+            [(sym.name, sym.kind, sym.line_start) for sym in parsed["symbols"]]
+            == [(sym.name, sym.kind, sym.line_start) for sym in full_symbols]
+        )
+
+
+class TestTreeSignatureFastPath:
+    """The tree-signature skip must never fire against an empty index."""
+
+    def _index_once(self, temp_dir):
+        """Index a one-file tree into a schema-only database.
+
+        Embedding generation is stubbed out so the test needs neither the
+        model nor the sqlite-vec extension; with no embeddings the storage
+        phase never touches the vec0 tables.
+        """
+        src_dir = temp_dir / "proj"
+        src_dir.mkdir()
+        (src_dir / "mod.py").write_text("def alpha(value):\n    return value\n")
+        conn = sqlite3.connect(temp_dir / "code_memory.db")
+        conn.executescript(db_mod._SCHEMA_SQL)
+        with patch.object(db_mod, "embed_texts_batch", return_value=[]):
+            parser_mod.index_directory(str(src_dir), conn)
+        return src_dir, conn
+
+    def test_unchanged_tree_is_skipped(self, temp_dir):
+        src_dir, conn = self._index_once(temp_dir)
+
+        with patch.object(db_mod, "embed_texts_batch", return_value=[]):
+            results = parser_mod.index_directory(str(src_dir), conn)
+
+        assert results
+        assert all(r["skipped"] for r in results)
+
+    def test_matching_signature_with_empty_index_rescans(self, temp_dir):
+        """A signature that outlived its rows must not short-circuit the run.
+
+        This is the state an index invalidation leaves behind if the
+        signature keys survive it: files/symbols empty, signature matching.
+        Skipping here would return "up to date" against an empty index.
+        """
+        src_dir, conn = self._index_once(temp_dir)
+        conn.execute("DELETE FROM symbols")
+        conn.execute("DELETE FROM files")
+        conn.commit()
+
+        with patch.object(db_mod, "embed_texts_batch", return_value=[]):
+            results = parser_mod.index_directory(str(src_dir), conn)
+
+        assert results
+        assert not any(r["skipped"] for r in results)
+        names = {r[0] for r in conn.execute("SELECT name FROM symbols")}
+        assert "alpha" in names